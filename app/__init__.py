@@ -27,6 +27,16 @@ def create_app(config_class=Config):
     mail.init_app(app)
     limiter.init_app(app)
     cache.init_app(app)
+    from app.utils.api_cache import register_version_listeners
+    register_version_listeners()
+    from app.services.metrics_service import register_metric_listeners
+    register_metric_listeners()
+    from app.services.usage_service import register_usage_listeners
+    register_usage_listeners()
+    from app.utils.principal_cache import register_principal_listeners
+    register_principal_listeners()
+    from app.utils.llm_metrics import load_tokenizers
+    load_tokenizers(app.config.get('TIKTOKEN_CACHE_DIR'))
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
     # Register blueprints
@@ -67,4 +77,5 @@ def create_app(config_class=Config):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from app.utils.principal_cache import load_principal
+    return load_principal(int(user_id))
@@ -1,6 +1,10 @@
 """API v1 Blueprint"""
-from flask import Blueprint, jsonify, request, abort
+from datetime import date
+from flask import Blueprint, jsonify, request, abort, current_app
 from app.models import db, Company, ComplianceRecord, User
+from app.services.compliance_service import ComplianceService
+from app.services.metrics_service import MetricsService
+from app.utils.api_cache import cached_api
 from app.utils.decorators import log_audit
 from flask_login import login_required, current_user
 
@@ -13,6 +17,7 @@ def health():
 
 @api_bp.route('/companies')
 @login_required
+@cached_api('companies')
 def list_companies():
     """List companies for current user"""
     if current_user.is_super_admin:
@@ -33,8 +38,14 @@ def list_companies():
 
 @api_bp.route('/companies/<int:company_id>/compliances')
 @login_required
+@cached_api('company:{company_id}', 'records')
 def company_compliances(company_id):
-    """Get compliance records for a company"""
+    """
+    Get compliance records for a company, one page at a time.
+    
+    Query params: cursor, limit, fields (comma-separated), status,
+    financial_year, due_from / due_to (YYYY-MM-DD).
+    """
     company = Company.query.get_or_404(company_id)
     
     # Check access
@@ -44,32 +55,87 @@ def company_compliances(company_id):
         if current_user.is_company_user and current_user.company_id != company.id:
             abort(403)
     
-    records = ComplianceRecord.query.filter_by(company_id=company.id).all()
+    max_limit = current_app.config.get('API_MAX_PAGE_SIZE', 500)
+    try:
+        limit = min(max(request.args.get('limit', current_app.config.get('API_PAGE_SIZE', 100), type=int), 1), max_limit)
+        fields = ComplianceService.parse_fields(request.args.get('fields'))
+        due_from = request.args.get('due_from')
+        due_to = request.args.get('due_to')
+        records, next_cursor = ComplianceService.page_records(
+            company.id,
+            fields=fields,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            status=request.args.get('status'),
+            financial_year=request.args.get('financial_year'),
+            due_from=date.fromisoformat(due_from) if due_from else None,
+            due_to=date.fromisoformat(due_to) if due_to else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'company': company.name,
-        'compliances': [{
-            'id': r.id,
-            'name': r.compliance_master.name,
-            'due_date': r.due_date.isoformat(),
-            'status': r.status,
-            'financial_year': r.financial_year
-        } for r in records]
+        'compliances': records,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
     }), 200
 
 @api_bp.route('/stats')
 @login_required
+@cached_api('stats')
 def stats():
     """Get system stats"""
     if not current_user.is_super_admin:
         abort(403)
     
-    total_companies = Company.query.count()
-    total_users = User.query.count()
-    active_compliances = ComplianceRecord.query.filter_by(status='Pending').count()
+    metrics = MetricsService.get_snapshot()
+    
+    return jsonify({
+        'total_companies': metrics['total_companies'],
+        'total_users': metrics['total_users'],
+        'active_compliances': metrics['active_compliances'],
+        'as_of': metrics['updated_at'].isoformat() + 'Z',
+        'refreshed_at': metrics['refreshed_at'].isoformat() + 'Z'
+    }), 200
+
+@api_bp.route('/metrics/llm')
+@login_required
+def llm_metrics():
+    """LLM token usage, latency and cost per operation, plus TOON savings"""
+    if not current_user.is_super_admin:
+        abort(403)
+    
+    from app.llm_engine import OPENAI_MODEL, BATCH_FIELDS
+    from app.utils.llm_cache import get_extraction_cache
+    from app.utils.llm_metrics import get_llm_metrics, summarize, tokenizer_name
+    from app.utils.toon import compare_formats
+    
+    try:
+        usage = summarize(get_llm_metrics().totals())
+    except Exception as e:
+        print(f"LLM metrics error: {e}")
+        usage = []
+    cache = get_extraction_cache()
+    
+    sample = {
+        'compliance_name': 'GST GSTR-3B',
+        'new_due_date': '2024-04-25',
+        'financial_year': '2023-2024',
+        'is_permanent': False
+    }
+    table = [dict(sample, id=i) for i in range(10)]
+    
+    def savings(data):
+        report = compare_formats(data, OPENAI_MODEL)
+        return {k: report[k] for k in ('json_tokens', 'toon_tokens', 'token_savings_percent')}
     
     return jsonify({
-        'total_companies': total_companies,
-        'total_users': total_users,
-        'active_compliances': active_compliances
+        'usage': usage,
+        'cache': cache.stats() if cache else None,
+        'tokenizer': tokenizer_name(OPENAI_MODEL),
+        'toon_savings': {
+            'record': savings(sample),
+            'table': savings([{field: row[field] for field in BATCH_FIELDS} for row in table])
+        }
     }), 200
@@ -1,64 +1,68 @@
 import os
 import json
-from openai import OpenAI
-from anthropic import Anthropic
+import time
+import atexit
+import asyncio
+import threading
+from openai import OpenAI, AsyncOpenAI, RateLimitError as OpenAIRateLimitError
+from anthropic import Anthropic, AsyncAnthropic, RateLimitError as AnthropicRateLimitError
 from flask import current_app
+from app.utils.llm_cache import get_extraction_cache, make_cache_key
+from app.utils.toon import toon_encode, toon_decode, toon_decode_table
+from app.utils.llm_metrics import get_llm_metrics, record_llm_call, usage_from_response
+
+# Bump when the extraction/validation prompts change to invalidate cached results
+PROMPT_VERSION = 'v2'
+BATCH_PROMPT_VERSION = 'v2-batch'
+OPENAI_MODEL = "gpt-3.5-turbo"
+ANTHROPIC_MODEL = "claude-3-5-sonnet-20241022"
+
+# Clients keep their HTTP connection pools, so reuse them across calls
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_client(factory, api_key, base_url):
+    key = (factory, api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory(api_key=api_key, base_url=base_url)
+                _clients[key] = client
+    return client
 
 def get_openai_client():
-    return OpenAI(api_key=current_app.config['OPENAI_API_KEY'])
+    return _get_client(OpenAI, current_app.config['OPENAI_API_KEY'],
+                       current_app.config.get('OPENAI_BASE_URL'))
 
 def get_anthropic_client():
-    return Anthropic(api_key=current_app.config['ANTHROPIC_API_KEY'])
+    return _get_client(Anthropic, current_app.config['ANTHROPIC_API_KEY'],
+                       current_app.config.get('ANTHROPIC_BASE_URL'))
 
-def toon_to_dict(toon_string):
-    """
-    Convert TOON format to Python dictionary.
-    TOON format: key:value|key:value|key:nested_key:value
-    More token-efficient than JSON.
-    """
-    result = {}
-    pairs = toon_string.strip().split('|')
-    
-    for pair in pairs:
-        if ':' not in pair:
-            continue
-        parts = pair.split(':')
-        if len(parts) == 2:
-            key, value = parts
-            # Handle boolean values
-            if value.lower() == 'true':
-                result[key.strip()] = True
-            elif value.lower() == 'false':
-                result[key.strip()] = False
-            else:
-                result[key.strip()] = value.strip()
-        elif len(parts) > 2:
-            # Nested structure
-            result[parts[0].strip()] = ':'.join(parts[1:]).strip()
-    
-    return result
+def _response_text(response):
+    """Completion text from an OpenAI or Anthropic response"""
+    if hasattr(response, 'choices'):
+        return response.choices[0].message.content
+    return response.content[0].text
 
-def dict_to_toon(data):
-    """
-    Convert Python dictionary to TOON format.
-    More compact than JSON for LLM responses.
-    """
-    pairs = []
-    for key, value in data.items():
-        if isinstance(value, bool):
-            pairs.append(f"{key}:{str(value).lower()}")
-        else:
-            pairs.append(f"{key}:{value}")
-    return '|'.join(pairs)
+def tracked_call(operation, model, prompt, make_request, metrics=None):
+    """Make a provider call and record its tokens, latency and cost"""
+    started = time.perf_counter()
+    try:
+        response = make_request()
+    except Exception:
+        record_llm_call(operation, model, prompt=prompt, error=True, metrics=metrics,
+                        latency_ms=(time.perf_counter() - started) * 1000)
+        raise
+    content = _response_text(response)
+    record_llm_call(operation, model, response, prompt, content, metrics=metrics,
+                    latency_ms=(time.perf_counter() - started) * 1000)
+    return response, content
 
-def parse_regulatory_text(text):
-    """
-    Uses OpenAI to parse unstructured regulatory text.
-    Now using TOON format for token efficiency.
-    """
-    client = get_openai_client()
-    
-    prompt = f"""
+def build_extraction_prompt(text):
+    """Prompt asking OpenAI for a single TOON extraction record"""
+    return f"""
 Extract compliance information from the regulatory text below and return in TOON format.
 TOON format uses pipe-separated key:value pairs for efficiency.
 
@@ -76,46 +80,29 @@ Text:
 
 Return ONLY the TOON formatted string:
 """
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=150
-        )
-        content = response.choices[0].message.content.strip()
-        
-        # Parse TOON to dict
-        result = toon_to_dict(content)
-        
-        # Convert to expected format
-        return {
-            'Compliance Name': result.get('compliance_name', ''),
-            'New Due Date': result.get('new_due_date', ''),
-            'Financial Year': result.get('financial_year', ''),
-            'Is this a permanent change?': result.get('is_permanent') == 'true'
-        }
-    except Exception as e:
-        print(f"OpenAI Error: {e}")
-        return None
 
-def validate_extraction(text, extracted_data):
-    """
-    Uses Claude to validate the extraction.
-    Using TOON format for efficiency.
-    """
-    client = get_anthropic_client()
+def parse_extraction(content):
+    """Convert the extraction TOON response to the expected format"""
+    result = toon_decode(content, typed=False)
     
+    return {
+        'Compliance Name': result.get('compliance_name', ''),
+        'New Due Date': result.get('new_due_date', ''),
+        'Financial Year': result.get('financial_year', ''),
+        'Is this a permanent change?': result.get('is_permanent', '').lower() == 'true'
+    }
+
+def build_validation_prompt(text, extracted_data):
+    """Prompt asking Claude to verify an extraction"""
     # Convert extracted data to TOON
-    toon_data = dict_to_toon({
+    toon_data = toon_encode({
         'compliance_name': extracted_data.get('Compliance Name', ''),
         'new_due_date': extracted_data.get('New Due Date', ''),
         'financial_year': extracted_data.get('Financial Year', ''),
         'is_permanent': str(extracted_data.get('Is this a permanent change?', False)).lower()
     })
     
-    prompt = f"""
+    return f"""
 You are a Senior Compliance Auditor. Verify if the extracted data matches the regulatory text.
 
 Regulatory Text:
@@ -135,40 +122,213 @@ valid:true|reason:Data matches text
 
 Return ONLY the TOON formatted validation:
 """
+
+def parse_validation(content, extracted_data):
+    """Convert the validation TOON response to a validation result"""
+    validation = toon_decode(content, typed=False)
+    valid = validation.get('valid', '').lower() == 'true'
     
+    return {
+        'valid': valid,
+        'reason': validation.get('reason', 'Validation completed'),
+        'corrected_data': {
+            'Compliance Name': validation.get('corrected_compliance_name', extracted_data.get('Compliance Name')),
+            'New Due Date': validation.get('corrected_new_due_date', extracted_data.get('New Due Date')),
+            'Financial Year': extracted_data.get('Financial Year'),
+            'Is this a permanent change?': extracted_data.get('Is this a permanent change?')
+        } if not valid else None
+    }
+
+def skipped_validation():
+    """
+    Fallback when Claude fails: assume valid, but mark it skipped so the
+    unverified extraction is used once and never cached.
+    """
+    return {"valid": True, "reason": "Validation skipped due to error", "skipped": True}
+
+def select_result(extracted, validation):
+    """Pick the extraction or Claude's correction"""
+    if validation.get('valid'):
+        return extracted
+    return validation.get('corrected_data')
+
+BATCH_FIELDS = ('id', 'compliance_name', 'new_due_date', 'financial_year', 'is_permanent')
+
+def build_batch_extraction_prompt(texts):
+    """Prompt asking OpenAI for one TOON table row per extracted change"""
+    items = '\n'.join(f"[{i}] {' '.join(text.split())}" for i, text in enumerate(texts, 1))
+
+    return f"""
+Extract compliance information from each numbered regulatory text below and return a TOON table.
+The first line is the table header, then one pipe-separated row per due date change.
+A text announcing several changes gets several rows with the same id.
+
+Columns:
+- id: number of the source text
+- compliance_name: Name of the compliance
+- new_due_date: Date in YYYY-MM-DD format
+- financial_year: e.g., 2023-2024
+- is_permanent: true or false
+
+Example TOON output:
+extractions[2]{{{','.join(BATCH_FIELDS)}}}:
+1|GST GSTR-3B|2024-04-25|2023-2024|false
+2|Income Tax Return|2024-07-31|2023-2024|false
+
+Texts:
+{items}
+
+Return ONLY the TOON table:
+"""
+
+def parse_batch_extraction(content, count):
+    """
+    Split a TOON table response into per-text extraction lists.
+    Rows with an unknown id, wrong column count or an invalid date are
+    dropped, so their source text shows up as an empty list.
+    """
+    results = [[] for _ in range(count)]
+    content = content.strip()
+    # Rows start with a numeric id; without a header fall back to the known columns
+    fields = BATCH_FIELDS if content[:1].isdigit() else None
+    for row in toon_decode_table(content, typed=False, fields=fields):
+        if tuple(row) != BATCH_FIELDS:
+            continue
+        try:
+            index = int(row['id'].strip('[]')) - 1
+            time.strptime(row['new_due_date'], '%Y-%m-%d')
+        except ValueError:
+            continue
+        if not 0 <= index < count or not row['compliance_name']:
+            continue
+        results[index].append({
+            'Compliance Name': row['compliance_name'],
+            'New Due Date': row['new_due_date'],
+            'Financial Year': row['financial_year'],
+            'Is this a permanent change?': row['is_permanent'].lower() == 'true'
+        })
+    return results
+
+def batch_max_tokens(count):
+    """Completion budget for a batch: header plus a few rows per text"""
+    return 40 + 60 * count
+
+def parse_regulatory_texts(texts):
+    """
+    Uses OpenAI to parse several regulatory texts in one request.
+    Returns (results, usage): one list of extractions per text, plus the
+    batch's token usage and latency. Texts missing from the response fall
+    back to single-text calls.
+    """
+    texts = list(texts)
+    client = get_openai_client()
+    usage = {'items': len(texts), 'prompt_tokens': 0, 'completion_tokens': 0,
+             'latency_ms': 0.0, 'fallbacks': 0}
+
+    started = time.perf_counter()
+    prompt = build_batch_extraction_prompt(texts)
     try:
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
+        response, content = tracked_call('extract_batch', OPENAI_MODEL, prompt, lambda: client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=batch_max_tokens(len(texts))
+        ))
+        results = parse_batch_extraction(content, len(texts))
+        prompt_tokens, completion_tokens, _ = usage_from_response(response, prompt, content, OPENAI_MODEL)
+        usage['prompt_tokens'] += prompt_tokens
+        usage['completion_tokens'] += completion_tokens
+    except Exception as e:
+        print(f"OpenAI Error: {e}")
+        results = [[] for _ in texts]
+
+    for i, text in enumerate(texts):
+        if not results[i]:
+            usage['fallbacks'] += 1
+            single = parse_regulatory_text(text)
+            results[i] = [single] if single else []
+
+    usage['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return results, usage
+
+def compare_batch_sizes(texts, batch_sizes=(1, 5, 10)):
+    """
+    Measure extraction cost per text for each batch size.
+    Makes real OpenAI calls; intended for the flask shell.
+    """
+    texts = list(texts)
+    report = []
+    for size in batch_sizes:
+        totals = {'prompt_tokens': 0, 'completion_tokens': 0, 'latency_ms': 0.0, 'fallbacks': 0}
+        for i in range(0, len(texts), size):
+            _, usage = parse_regulatory_texts(texts[i:i + size])
+            for key in totals:
+                totals[key] += usage[key]
+        report.append({
+            'batch_size': size,
+            'tokens_per_item': round((totals['prompt_tokens'] + totals['completion_tokens']) / max(len(texts), 1), 1),
+            'latency_ms_per_item': round(totals['latency_ms'] / max(len(texts), 1), 2),
+            **totals
+        })
+    return report
+
+def parse_regulatory_text(text):
+    """
+    Uses OpenAI to parse unstructured regulatory text.
+    Now using TOON format for token efficiency.
+    """
+    client = get_openai_client()
+    prompt = build_extraction_prompt(text)
+    
+    try:
+        _, content = tracked_call('extract', OPENAI_MODEL, prompt, lambda: client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=150
+        ))
+        return parse_extraction(content)
+    except Exception as e:
+        print(f"OpenAI Error: {e}")
+        return None
+
+def validate_extraction(text, extracted_data):
+    """
+    Uses Claude to validate the extraction.
+    Using TOON format for efficiency.
+    """
+    client = get_anthropic_client()
+    prompt = build_validation_prompt(text, extracted_data)
+    
+    try:
+        _, content = tracked_call('validate', ANTHROPIC_MODEL, prompt, lambda: client.messages.create(
+            model=ANTHROPIC_MODEL,
             max_tokens=200,
             messages=[
                 {"role": "user", "content": prompt}
             ]
-        )
-        content = message.content[0].text.strip()
-        
-        # Parse TOON response
-        validation = toon_to_dict(content)
-        
-        return {
-            'valid': validation.get('valid') == 'true',
-            'reason': validation.get('reason', 'Validation completed'),
-            'corrected_data': {
-                'Compliance Name': validation.get('corrected_compliance_name', extracted_data.get('Compliance Name')),
-                'New Due Date': validation.get('corrected_new_due_date', extracted_data.get('New Due Date')),
-                'Financial Year': extracted_data.get('Financial Year'),
-                'Is this a permanent change?': extracted_data.get('Is this a permanent change?')
-            } if not validation.get('valid') == 'true' else None
-        }
+        ))
+        return parse_validation(content, extracted_data)
     except Exception as e:
         print(f"Anthropic Error: {e}")
-        # Fallback: assume valid if Claude fails
-        return {"valid": True, "reason": "Validation skipped due to error"}
+        return skipped_validation()
 
-def process_compliance_update(text):
+def process_compliance_update(text, use_cache=True):
     """
     Orchestrates the dual-LLM process with TOON format.
     More token-efficient than JSON.
+    Results are cached by text, prompt version and models, so an
+    already-processed circular skips both LLM calls.
     """
+    cache = get_extraction_cache() if use_cache else None
+    if cache:
+        key = make_cache_key(text, PROMPT_VERSION, (OPENAI_MODEL, ANTHROPIC_MODEL))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    started = time.perf_counter()
+    
     # 1. Parse with OpenAI (TOON format)
     extracted = parse_regulatory_text(text)
     if not extracted:
@@ -176,9 +336,270 @@ def process_compliance_update(text):
         
     # 2. Validate with Claude (TOON format)
     validation = validate_extraction(text, extracted)
+    result = select_result(extracted, validation)
     
-    if validation.get('valid'):
-        return extracted
-    else:
-        return validation.get('corrected_data')
+    if cache and result and not validation.get('skipped'):
+        cache.set(key, result, cost_ms=(time.perf_counter() - started) * 1000)
+    
+    return result
+
+class AsyncPipeline:
+    """
+    Concurrent dual-LLM pipeline for batches of regulatory texts.
+
+    One pair of async clients is shared by every run on the pipeline's
+    event loop (see process_compliance_updates). ``concurrency`` bounds how
+    many texts are in flight; each provider also has its own semaphore, and
+    a 429 from a provider pauses every call to that provider until its
+    retry-after has passed, instead of letting each task hammer it.
+    With ``batch_size`` > 1, texts are extracted ``batch_size`` at a time in
+    one OpenAI request and validated individually. Cache lookups run in a
+    worker thread so a Redis round-trip never blocks the loop.
+    """
 
+    def __init__(self, openai_api_key, anthropic_api_key, concurrency=10,
+                 openai_concurrency=5, anthropic_concurrency=5, max_retries=3,
+                 openai_base_url=None, anthropic_base_url=None, cache=None,
+                 batch_size=1, metrics=None):
+        self.openai = AsyncOpenAI(api_key=openai_api_key, base_url=openai_base_url, max_retries=0)
+        self.anthropic = AsyncAnthropic(api_key=anthropic_api_key, base_url=anthropic_base_url, max_retries=0)
+        self.concurrency = concurrency
+        self.openai_concurrency = openai_concurrency
+        self.anthropic_concurrency = anthropic_concurrency
+        self.max_retries = max_retries
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.metrics = metrics
+        self._loop = None
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            openai_api_key=config['OPENAI_API_KEY'],
+            anthropic_api_key=config['ANTHROPIC_API_KEY'],
+            concurrency=config.get('LLM_CONCURRENCY', 10),
+            openai_concurrency=config.get('OPENAI_MAX_CONCURRENCY', 5),
+            anthropic_concurrency=config.get('ANTHROPIC_MAX_CONCURRENCY', 5),
+            max_retries=config.get('LLM_MAX_RETRIES', 3),
+            openai_base_url=config.get('OPENAI_BASE_URL'),
+            anthropic_base_url=config.get('ANTHROPIC_BASE_URL'),
+            cache=get_extraction_cache(),
+            batch_size=config.get('LLM_BATCH_SIZE', 1),
+            metrics=get_llm_metrics()
+        )
+    
+    def _setup(self):
+        # Semaphores bind to the running loop; runs on the same loop share them
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._limit = asyncio.Semaphore(self.concurrency)
+        self._providers = {
+            'openai': asyncio.Semaphore(self.openai_concurrency),
+            'anthropic': asyncio.Semaphore(self.anthropic_concurrency)
+        }
+        self._resume_at = {'openai': 0.0, 'anthropic': 0.0}
+    
+    async def _call(self, provider, operation, model, prompt, make_request):
+        """
+        Run a provider call under its semaphore, backing off on 429s.
+        Returns (response, content) and records the call's metrics; the
+        latency is that of the request alone, not the wait for the
+        semaphore or a back-off. Retried 429s are not recorded.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            async with self._providers[provider]:
+                delay = self._resume_at[provider] - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                started = time.perf_counter()
+                response, error = None, None
+                try:
+                    response = await make_request()
+                except (OpenAIRateLimitError, AnthropicRateLimitError) as e:
+                    if attempt < self.max_retries:
+                        retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+                        try:
+                            wait = float(retry_after)
+                        except (TypeError, ValueError):
+                            wait = 2 ** attempt
+                        self._resume_at[provider] = max(self._resume_at[provider], loop.time() + wait)
+                        continue
+                    error = e
+                except Exception as e:
+                    error = e
+                latency_ms = (time.perf_counter() - started) * 1000
+            
+            content = _response_text(response) if error is None else None
+            # Off the loop: the Redis metrics sink is synchronous
+            await asyncio.to_thread(
+                record_llm_call, operation, model, response, prompt, content,
+                latency_ms=latency_ms, error=error is not None, metrics=self.metrics
+            )
+            if error is not None:
+                raise error
+            return response, content
+    
+    async def parse(self, text):
+        prompt = build_extraction_prompt(text)
+        try:
+            _, content = await self._call('openai', 'extract', OPENAI_MODEL, prompt, lambda: self.openai.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=150
+            ))
+            return parse_extraction(content)
+        except Exception as e:
+            print(f"OpenAI Error: {e}")
+            return None
+    
+    async def validate(self, text, extracted_data):
+        prompt = build_validation_prompt(text, extracted_data)
+        try:
+            _, content = await self._call('anthropic', 'validate', ANTHROPIC_MODEL, prompt, lambda: self.anthropic.messages.create(
+                model=ANTHROPIC_MODEL,
+                max_tokens=200,
+                messages=[{"role": "user", "content": prompt}]
+            ))
+            return parse_validation(content, extracted_data)
+        except Exception as e:
+            print(f"Anthropic Error: {e}")
+            return skipped_validation()
+    
+    async def process(self, text):
+        key = None
+        if self.cache:
+            key = make_cache_key(text, PROMPT_VERSION, (OPENAI_MODEL, ANTHROPIC_MODEL))
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        
+        async with self._limit:
+            started = time.perf_counter()
+            extracted = await self.parse(text)
+            if not extracted:
+                return None
+            validation = await self.validate(text, extracted)
+            result = select_result(extracted, validation)
+        
+        if self.cache and result and not validation.get('skipped'):
+            await asyncio.to_thread(self.cache.set, key, result,
+                                    cost_ms=(time.perf_counter() - started) * 1000)
+        return result
+    
+    async def parse_batch(self, texts):
+        """Extract several texts in one request, falling back to single calls"""
+        prompt = build_batch_extraction_prompt(texts)
+        try:
+            _, content = await self._call('openai', 'extract_batch', OPENAI_MODEL, prompt, lambda: self.openai.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=batch_max_tokens(len(texts))
+            ))
+            results = parse_batch_extraction(content, len(texts))
+        except Exception as e:
+            print(f"OpenAI Error: {e}")
+            results = [[] for _ in texts]
+        
+        missing = [i for i, rows in enumerate(results) if not rows]
+        singles = await asyncio.gather(*(self.parse(texts[i]) for i in missing))
+        for i, single in zip(missing, singles):
+            results[i] = [single] if single else []
+        return results
+    
+    async def process_batch(self, texts):
+        """Batched extraction plus per-row validation; one result list per text"""
+        results = [None] * len(texts)
+        keys = [None] * len(texts)
+        if self.cache:
+            keys = [make_cache_key(text, BATCH_PROMPT_VERSION, (OPENAI_MODEL, ANTHROPIC_MODEL)) for text in texts]
+            results = await asyncio.to_thread(lambda: [self.cache.get(key) for key in keys])
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        async with self._limit:
+            started = time.perf_counter()
+            extracted = await self.parse_batch([texts[i] for i in pending])
+            
+            async def validate_rows(i, rows):
+                validations = await asyncio.gather(*(self.validate(texts[i], row) for row in rows))
+                selected = [r for r in (select_result(row, v) for row, v in zip(rows, validations)) if r]
+                return selected, any(v.get('skipped') for v in validations)
+            
+            validated = await asyncio.gather(*(
+                validate_rows(i, rows) for i, rows in zip(pending, extracted)
+            ))
+            cost_ms = (time.perf_counter() - started) * 1000 / len(pending)
+        
+        store = []
+        for i, (rows, skipped) in zip(pending, validated):
+            results[i] = rows
+            if self.cache and rows and not skipped:
+                store.append((keys[i], rows))
+        if store:
+            await asyncio.to_thread(lambda: [self.cache.set(key, rows, cost_ms=cost_ms) for key, rows in store])
+        return results
+    
+    async def process_many(self, texts):
+        """
+        Process texts concurrently. Returns one list of extractions per text
+        (empty when nothing was extracted), in the order of ``texts``.
+        """
+        self._setup()
+        if self.batch_size > 1:
+            chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            batches = await asyncio.gather(*(self.process_batch(chunk) for chunk in chunks))
+            return [rows for batch in batches for rows in batch]
+        results = await asyncio.gather(*(self.process(text) for text in texts))
+        return [[result] if result else [] for result in results]
+    
+    async def close(self):
+        await self.openai.close()
+        await self.anthropic.close()
+
+# One pipeline per worker process, running on its own event loop thread.
+# asyncio.run would close its loop after every batch, and the async
+# clients' connection pools cannot outlive the loop they were opened on.
+_runner = None
+_runner_lock = threading.Lock()
+
+def _get_runner():
+    """Start (once per process, again after a fork) the pipeline loop"""
+    global _runner
+    with _runner_lock:
+        if _runner is None or _runner[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='llm-pipeline', daemon=True).start()
+            _runner = (os.getpid(), loop, AsyncPipeline.from_config(current_app.config))
+        return _runner
+
+@atexit.register
+def shutdown_pipeline():
+    """Close the pipeline's clients and stop its loop"""
+    global _runner
+    with _runner_lock:
+        runner, _runner = _runner, None
+    if runner is None or runner[0] != os.getpid():
+        return
+    _, loop, pipeline = runner
+    try:
+        asyncio.run_coroutine_threadsafe(pipeline.close(), loop).result(timeout=5)
+    except Exception as e:
+        print(f"LLM pipeline shutdown error: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+def process_compliance_updates(texts):
+    """
+    Run the dual-LLM pipeline over a batch of texts concurrently.
+    Returns one list of extractions per text, in input order; a single
+    notification can yield several extractions in batched mode.
+    Concurrent callers in one process share the pipeline's limits and
+    connection pools.
+    """
+    _, loop, pipeline = _get_runner()
+    return asyncio.run_coroutine_threadsafe(pipeline.process_many(list(texts)), loop).result()
@@ -6,7 +6,8 @@ from .user import User, AuditLog
 from .company import Company
 from .compliance import ComplianceMaster, ComplianceOverride, ComplianceRecord
 from .document import Document
-from .subscription import SubscriptionPlan, Subscription, Invoice, UsageCharge
+from .subscription import SubscriptionPlan, Subscription, Invoice, UsageCharge, SubscriptionUsage, StripeEvent
+from .metrics import MetricSnapshot
 
 __all__ = [
     'db',
@@ -20,5 +21,8 @@ __all__ = [
     'SubscriptionPlan',
     'Subscription',
     'Invoice',
-    'UsageCharge'
+    'UsageCharge',
+    'SubscriptionUsage',
+    'StripeEvent',
+    'MetricSnapshot'
 ]
@@ -3,6 +3,9 @@ from . import db
 
 class Company(db.Model):
     __tablename__ = 'company'
+    __table_args__ = (
+        db.Index('ix_company_practitioner_active', 'practitioner_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     practitioner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
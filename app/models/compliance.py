@@ -30,6 +30,14 @@ class ComplianceOverride(db.Model):
 
 class ComplianceRecord(db.Model):
     __tablename__ = 'compliance_record'
+    __table_args__ = (
+        db.Index('ix_compliance_record_company_status', 'company_id', 'status'),
+        db.Index('ix_compliance_record_status_due_date', 'status', 'due_date'),
+        db.Index('ix_compliance_record_compliance_period', 'compliance_id', 'period_start'),
+        db.Index('ix_compliance_record_company_due_date', 'company_id', 'due_date', 'id'),
+        db.UniqueConstraint('company_id', 'compliance_id', 'period_start',
+                            name='uq_compliance_record_period'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
@@ -39,6 +47,7 @@ class ComplianceRecord(db.Model):
     due_date = db.Column(db.Date, nullable=False, index=True)
     completed_date = db.Column(db.Date)
     financial_year = db.Column(db.String(9), index=True)  # e.g., "2023-2024"
+    period_start = db.Column(db.Date)  # First day of the period this record covers
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -11,6 +11,7 @@ class Document(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(512), nullable=False)
     file_size = db.Column(db.Integer)  # Size in bytes
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the shared blob
     mime_type = db.Column(db.String(100))
     
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,13 @@
+from datetime import datetime
+from . import db
+
+class MetricSnapshot(db.Model):
+    """Precomputed admin/API counters, one row per metric"""
+    __tablename__ = 'metric_snapshot'
+    
+    name = db.Column(db.String(64), primary_key=True)  # e.g. total_users, plan:3
+    label = db.Column(db.String(100))  # Display name (plan name for plan:* rows)
+    value = db.Column(db.Float, nullable=False, default=0)
+    
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last full recount
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last change (recount or increment)
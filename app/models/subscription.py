@@ -17,6 +17,9 @@ class SubscriptionPlan(db.Model):
 
 class Subscription(db.Model):
     __tablename__ = 'subscription'
+    __table_args__ = (
+        db.Index('ix_subscription_status_period_end', 'status', 'current_period_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     plan_id = db.Column(db.Integer, db.ForeignKey('subscription_plan.id'), nullable=False)
@@ -30,7 +33,7 @@ class Subscription(db.Model):
     stripe_customer_id = db.Column(db.String(100))
     
     # Billing
-    next_billing_date = db.Column(db.DateTime)
+    next_billing_date = db.Column(db.DateTime, index=True)
     cancel_at_period_end = db.Column(db.Boolean, default=False)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -44,6 +47,9 @@ class Subscription(db.Model):
 
 class Invoice(db.Model):
     __tablename__ = 'invoice'
+    __table_args__ = (
+        db.Index('ix_invoice_status_due_date', 'status', 'due_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=False)
@@ -58,7 +64,7 @@ class Invoice(db.Model):
     tax_amount = db.Column(db.Float, default=0)
     
     # Stripe
-    stripe_invoice_id = db.Column(db.String(100))
+    stripe_invoice_id = db.Column(db.String(100), index=True)
     stripe_payment_intent_id = db.Column(db.String(100))
     
     # Dates
@@ -68,6 +74,9 @@ class Invoice(db.Model):
 
 class UsageCharge(db.Model):
     __tablename__ = 'usage_charge'
+    __table_args__ = (
+        db.Index('ix_usage_charge_subscription_invoiced', 'subscription_id', 'invoiced'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=False)
@@ -80,3 +89,27 @@ class UsageCharge(db.Model):
     charged_at = db.Column(db.DateTime, default=datetime.utcnow)
     invoiced = db.Column(db.Boolean, default=False)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=True)
+
+class SubscriptionUsage(db.Model):
+    """Current-period usage per subscription, kept in step with companies and charges"""
+    __tablename__ = 'subscription_usage'
+    
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), primary_key=True)
+    
+    company_count = db.Column(db.Integer, nullable=False, default=0)  # Active companies
+    pending_charge_count = db.Column(db.Integer, nullable=False, default=0)  # Un-invoiced charges
+    pending_amount = db.Column(db.Float, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StripeEvent(db.Model):
+    """Stripe webhook events already applied (dedupe by event id)"""
+    __tablename__ = 'stripe_event'
+    
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id (evt_...)
+    type = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # processed, ignored, failed
+    error = db.Column(db.String(255))
+    
+    created_at = db.Column(db.DateTime)  # When Stripe created the event
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -17,7 +17,7 @@ class User(UserMixin, db.Model):
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=True)
     
     # For Practitioners
-    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=True, index=True)
     
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -55,6 +55,9 @@ class User(UserMixin, db.Model):
 
 class AuditLog(db.Model):
     __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_action_timestamp', 'action', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
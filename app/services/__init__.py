@@ -1,5 +1,17 @@
 # Service layer initialization
 from .subscription_service import SubscriptionService
 from .billing_service import BillingService
+from .stats_service import StatsService
+from .calendar_service import CalendarService
+from .document_service import DocumentService
+from .compliance_service import ComplianceService
+from .import_service import CompanyImportService
+from .audit_service import AuditService
+from .metrics_service import MetricsService
+from .usage_service import UsageService
+from .stripe_webhook_service import StripeWebhookService
 
-__all__ = ['SubscriptionService', 'BillingService']
+__all__ = ['SubscriptionService', 'BillingService', 'StatsService', 'CalendarService', 'DocumentService',
+           'ComplianceService', 'CompanyImportService',
+           'AuditService', 'MetricsService', 'UsageService',
+           'StripeWebhookService']
@@ -0,0 +1,266 @@
+import os
+import csv
+import gzip
+import re
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import db, AuditLog
+
+AUDIT_COLUMNS = ('id', 'user_id', 'action', 'details', 'ip_address', 'timestamp')
+PARTITION_NAME = re.compile(r'^audit_log_(\d{4})_(\d{2})$')
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+# Per database URL; the table's layout only changes with a migration
+_partitioned = {}
+
+def partition_name(month):
+    return f"audit_log_{month.year:04d}_{month.month:02d}"
+
+class AuditService:
+    """
+    Monthly storage for audit_log.
+
+    Postgres: audit_log is natively partitioned by month on timestamp
+    (see migration a7d4c9e2f1b8); partitions are created ahead of time and
+    old ones are exported and dropped whole.
+    Other databases, and a Postgres schema built with db.create_all()
+    instead of the migration: audit_log holds the current month only; a
+    rollover moves older rows into audit_log_YYYY_MM tables with the same
+    columns, which are exported and dropped the same way.
+    """
+
+    @staticmethod
+    def _is_postgres():
+        return db.session.get_bind().dialect.name == 'postgresql'
+
+    @staticmethod
+    def _is_partitioned():
+        """Whether audit_log is natively partitioned (checked once per database)"""
+        bind = db.session.get_bind()
+        key = str(bind.url)
+        if key not in _partitioned:
+            partitioned = False
+            if bind.dialect.name == 'postgresql':
+                partitioned = db.session.execute(db.text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                    "WHERE partrelid = to_regclass('audit_log'))"
+                )).scalar()
+                if not partitioned:
+                    print("Audit Partition Warning: audit_log is not partitioned "
+                          "(run the migrations); rolling months over into tables instead")
+            _partitioned[key] = partitioned
+        return _partitioned[key]
+
+    @staticmethod
+    def _month_table(name):
+        """Table object for a rollover table (own index names: SQLite indexes are global)"""
+        metadata = db.MetaData()
+        return db.Table(
+            name, metadata,
+            db.Column('id', db.Integer, primary_key=True),
+            db.Column('user_id', db.Integer),
+            db.Column('action', db.String(50), nullable=False),
+            db.Column('details', db.String(255)),
+            db.Column('ip_address', db.String(50)),
+            db.Column('timestamp', db.DateTime),
+            db.Index(f'ix_{name}_action_timestamp', 'action', 'timestamp'),
+            db.Index(f'ix_{name}_timestamp', 'timestamp'),
+        )
+
+    @staticmethod
+    def month_tables():
+        """Existing monthly tables (partitions or rollover tables), newest first"""
+        names = db.inspect(db.session.get_bind()).get_table_names()
+        months = []
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                months.append((datetime(int(match.group(1)), int(match.group(2)), 1), name))
+        return sorted(months, reverse=True)
+
+    @staticmethod
+    def ensure_partitions(months_ahead=2, now=None):
+        """Create monthly partitions up to ``months_ahead`` months from now (Postgres)"""
+        if not AuditService._is_partitioned():
+            return []
+        month = month_start(now or datetime.utcnow())
+        created = []
+        for _ in range(months_ahead + 1):
+            upper = next_month(month)
+            name = partition_name(month)
+            try:
+                db.session.execute(db.text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_log "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+                ))
+                db.session.commit()
+                created.append(name)
+            except Exception as e:
+                # Fails if the default partition already holds rows for this month
+                db.session.rollback()
+                print(f"Audit Partition Error ({name}): {e}")
+            month = upper
+        return created
+
+    @staticmethod
+    def rollover(now=None):
+        """Move rows from before the current month into audit_log_YYYY_MM tables (unpartitioned)"""
+        if AuditService._is_partitioned():
+            return 0
+        cutoff = month_start(now or datetime.utcnow())
+        oldest = db.session.query(db.func.min(AuditLog.timestamp)).filter(
+            AuditLog.timestamp < cutoff
+        ).scalar()
+        moved = 0
+        month = month_start(oldest) if oldest else cutoff
+        columns = [getattr(AuditLog, c) for c in AUDIT_COLUMNS]
+        while month < cutoff:
+            upper = next_month(month)
+            table = AuditService._month_table(partition_name(month))
+            table.create(db.session.connection(), checkfirst=True)
+            in_month = db.and_(AuditLog.timestamp >= month, AuditLog.timestamp < upper)
+            db.session.execute(table.insert().from_select(
+                list(AUDIT_COLUMNS), db.select(*columns).where(in_month)
+            ))
+            moved += db.session.execute(
+                db.delete(AuditLog).where(in_month).execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            month = upper
+        return moved
+
+    @staticmethod
+    def _export_rows(name, path):
+        """Write a monthly table to a gzip CSV (COPY on Postgres, streamed rows elsewhere)"""
+        columns = ', '.join(AUDIT_COLUMNS)
+        if AuditService._is_postgres():
+            cursor = db.session.connection().connection.cursor()
+            try:
+                with gzip.open(path, 'wt', newline='') as out:
+                    out.write(','.join(AUDIT_COLUMNS) + '\n')
+                    cursor.copy_expert(f"COPY (SELECT {columns} FROM {name} ORDER BY timestamp, id) TO STDOUT WITH CSV", out)
+            finally:
+                cursor.close()
+            return
+
+        table = AuditService._month_table(name)
+        with gzip.open(path, 'wt', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(AUDIT_COLUMNS)
+            result = db.session.execute(
+                db.select(*table.c).order_by(table.c.timestamp, table.c.id).execution_options(yield_per=5000)
+            )
+            for row in result:
+                writer.writerow(row)
+
+    @staticmethod
+    def archive_expired(retention_months=None, archive_folder=None, now=None):
+        """
+        Export monthly tables older than the retention window to
+        <archive_folder>/audit_log_YYYY_MM.csv.gz, then drop them.
+        Dropping a whole partition frees its space immediately, unlike a
+        DELETE that leaves dead tuples behind for VACUUM.
+        """
+        started = time.perf_counter()
+        config = current_app.config
+        retention_months = retention_months or config.get('AUDIT_RETENTION_MONTHS', 12)
+        archive_folder = archive_folder or config.get('AUDIT_ARCHIVE_FOLDER')
+        os.makedirs(archive_folder, exist_ok=True)
+
+        cutoff = month_start(now or datetime.utcnow())
+        for _ in range(retention_months):
+            cutoff = month_start(cutoff - timedelta(days=1))
+
+        archived = []
+        for month, name in AuditService.month_tables():
+            if month >= cutoff:
+                continue
+            path = os.path.join(archive_folder, f"{name}.csv.gz")
+            try:
+                AuditService._export_rows(name, path)
+                if AuditService._is_partitioned():
+                    db.session.execute(db.text(f"ALTER TABLE audit_log DETACH PARTITION {name}"))
+                db.session.execute(db.text(f"DROP TABLE {name}"))
+                db.session.commit()
+                archived.append({'table': name, 'file': path})
+            except Exception as e:
+                db.session.rollback()
+                print(f"Audit Archive Error ({name}): {e}")
+
+        return {
+            'cutoff': cutoff.isoformat(),
+            'archived': archived,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    @staticmethod
+    def maintain(now=None):
+        """Daily job: create upcoming partitions / roll over, then apply retention"""
+        return {
+            'partitions': AuditService.ensure_partitions(now=now),
+            'rolled_over': AuditService.rollover(now=now),
+            'retention': AuditService.archive_expired(now=now)
+        }
+
+    @staticmethod
+    def encode_cursor(log):
+        return f"{log.timestamp.isoformat()}_{log.id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        timestamp, _, log_id = cursor.rpartition('_')
+        return datetime.fromisoformat(timestamp), int(log_id)
+
+    @staticmethod
+    def query_logs(action=None, before=None, limit=100):
+        """
+        Newest-first audit rows with keyset pagination on (timestamp, id).
+        ``before`` is a cursor from encode_cursor. Each page is an index
+        range scan on (action, timestamp) or (timestamp), so deep pages
+        cost the same as the first; there is no COUNT or OFFSET.
+        Without native partitioning, rolled-over months are read from their
+        monthly tables once the current table is exhausted.
+        """
+        tables = [AuditLog.__table__]
+        if not AuditService._is_partitioned():
+            tables += [AuditService._month_table(name) for _, name in AuditService.month_tables()]
+
+        cursor = AuditService.decode_cursor(before) if before else None
+        rows = []
+        for table in tables:
+            query = db.select(*[table.c[c] for c in AUDIT_COLUMNS])
+            if action:
+                query = query.where(table.c.action == action)
+            if cursor:
+                query = query.where(db.or_(
+                    table.c.timestamp < cursor[0],
+                    db.and_(table.c.timestamp == cursor[0], table.c.id < cursor[1])
+                ))
+            rows += db.session.execute(
+                query.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit - len(rows))
+            ).all()
+            if len(rows) >= limit:
+                break
+
+        next_cursor = AuditService.encode_cursor(rows[-1]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    @staticmethod
+    def recent(limit=20, days=31):
+        """
+        Latest rows from the live table, looking at recent partitions first.
+        Without native partitioning the live table holds the current month.
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        logs = AuditLog.query.filter(AuditLog.timestamp >= since).order_by(
+            AuditLog.timestamp.desc(), AuditLog.id.desc()
+        ).limit(limit).all()
+        if len(logs) < limit:
+            logs = AuditLog.query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit).all()
+        return logs
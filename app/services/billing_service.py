@@ -1,5 +1,11 @@
-from datetime import datetime
-from app.models import db, Invoice, UsageCharge, Subscription
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Invoice, UsageCharge, Subscription, SubscriptionPlan
+from app.services.subscription_service import SubscriptionService
+from app.services.usage_service import UsageService
+
+BILLING_CYCLE_DAYS = 30
 
 class BillingService:
     """Handles billing, invoices, and usage charges"""
@@ -36,6 +42,20 @@ class BillingService:
         
         return charge
     
+    @staticmethod
+    def charge_extra_companies(subscription, count, description):
+        """Charge for several companies beyond plan limit as one usage charge"""
+        plan = subscription.plan
+        
+        charge = BillingService.create_usage_charge(
+            subscription,
+            description,
+            count,
+            plan.extra_company_cost
+        )
+        
+        return charge
+    
     @staticmethod
     def create_invoice(subscription, base_amount=None, stripe_invoice_id=None):
         """Create an invoice for a subscription"""
@@ -45,12 +65,14 @@ class BillingService:
             base_amount = plan.price
         
         # Calculate usage charges
-        pending_charges = UsageCharge.query.filter_by(
-            subscription_id=subscription.id,
-            invoiced=False
-        ).all()
-        
-        usage_amount = sum(charge.amount for charge in pending_charges)
+        pending = db.and_(
+            UsageCharge.subscription_id == subscription.id,
+            UsageCharge.invoiced == False
+        )
+        usage_amount, last_charge_id = db.session.query(
+            db.func.coalesce(db.func.sum(UsageCharge.amount), 0),
+            db.func.max(UsageCharge.id)
+        ).filter(pending).one()
         
         invoice = Invoice(
             subscription_id=subscription.id,
@@ -66,49 +88,155 @@ class BillingService:
         )
         
         db.session.add(invoice)
-        
-        # Mark charges as invoiced
-        for charge in pending_charges:
-            charge.invoiced = True
-            charge.invoice_id = invoice.id
+        db.session.flush()
+        
+        # Mark the charges that were summed as invoiced, in one statement
+        if last_charge_id is not None:
+            db.session.execute(
+                db.update(UsageCharge).where(
+                    pending, UsageCharge.id <= last_charge_id
+                ).values(
+                    invoiced=True,
+                    invoice_id=invoice.id
+                ).execution_options(synchronize_session=False)
+            )
+            UsageService.refresh([subscription.id])
         
         db.session.commit()
         
         return invoice
     
     @staticmethod
-    def mark_invoice_paid(invoice, stripe_payment_intent_id=None):
-        """Mark an invoice as paid"""
+    def invoice_number(subscription_id, billing_date):
+        """Deterministic per subscription and cycle, so a cycle is never invoiced twice"""
+        return f"INV-{subscription_id}-{billing_date.strftime('%Y%m%d')}"
+    
+    @staticmethod
+    def run_billing_cycle(now=None, chunk_size=500):
+        """
+        Invoice every active subscription whose next_billing_date has passed.
+        
+        Each chunk of subscriptions is one transaction: one aggregate query
+        for plan price plus uninvoiced usage, one multi-row INSERT of
+        invoices, one UPDATE stamping usage_charge.invoice_id and one
+        bulk UPDATE moving the subscriptions to their next period.
+        A crash loses at most the open chunk, and re-running picks up the
+        subscriptions that are still due. Invoice numbers are derived from
+        the billing date and are unique, so overlapping runs cannot bill a
+        cycle twice: the losing chunk rolls back and is skipped.
+        Subscriptions behind by several cycles advance one cycle per run.
+        """
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        # Charges created while the run is in progress wait for the next cycle
+        charge_cutoff = db.session.query(db.func.max(UsageCharge.id)).scalar() or 0
+        report = {'invoiced': 0, 'amount': 0.0, 'chunks': 0, 'skipped_chunks': 0}
+        last_id = 0
+        
+        while True:
+            pending = db.and_(
+                UsageCharge.subscription_id == Subscription.id,
+                UsageCharge.invoiced == False,
+                UsageCharge.id <= charge_cutoff
+            )
+            due = db.session.query(
+                Subscription.id,
+                Subscription.next_billing_date,
+                SubscriptionPlan.price,
+                db.func.coalesce(db.func.sum(UsageCharge.amount), 0)
+            ).join(
+                SubscriptionPlan, SubscriptionPlan.id == Subscription.plan_id
+            ).outerjoin(
+                UsageCharge, pending
+            ).filter(
+                Subscription.id > last_id,
+                Subscription.status == 'active',
+                Subscription.cancel_at_period_end.is_not(True),
+                Subscription.next_billing_date <= now
+            ).group_by(
+                Subscription.id, Subscription.next_billing_date, SubscriptionPlan.price
+            ).order_by(Subscription.id).limit(chunk_size).all()
+            
+            if not due:
+                break
+            last_id = due[-1][0]
+            
+            invoices = [{
+                'subscription_id': sub_id,
+                'invoice_number': BillingService.invoice_number(sub_id, billing_date),
+                'base_amount': price,
+                'usage_amount': usage,
+                'amount': price + usage,
+                'tax_amount': 0,
+                'status': 'pending',
+                'created_at': now,
+                'due_date': now
+            } for sub_id, billing_date, price, usage in due]
+            
+            try:
+                invoice_ids = dict(db.session.execute(
+                    db.insert(Invoice).returning(Invoice.subscription_id, Invoice.id),
+                    invoices
+                ).all())
+                
+                db.session.execute(
+                    db.update(UsageCharge).where(
+                        UsageCharge.subscription_id.in_(list(invoice_ids)),
+                        UsageCharge.invoiced == False,
+                        UsageCharge.id <= charge_cutoff
+                    ).values(
+                        invoiced=True,
+                        invoice_id=db.case(invoice_ids, value=UsageCharge.subscription_id)
+                    ).execution_options(synchronize_session=False)
+                )
+                
+                db.session.execute(db.update(Subscription), [{
+                    'id': sub_id,
+                    'current_period_start': billing_date,
+                    'current_period_end': billing_date + timedelta(days=BILLING_CYCLE_DAYS),
+                    'next_billing_date': billing_date + timedelta(days=BILLING_CYCLE_DAYS),
+                    'updated_at': now
+                } for sub_id, billing_date, _, _ in due])
+                
+                UsageService.refresh(list(invoice_ids))
+                db.session.commit()
+            except IntegrityError as e:
+                # Another run already invoiced part of this chunk
+                db.session.rollback()
+                report['skipped_chunks'] += 1
+                print(f"Billing Cycle Error (subscriptions {due[0][0]}-{last_id}): {e}")
+                continue
+            # The bulk UPDATE moved their periods under the subscription cache
+            SubscriptionService.invalidate(*[sub_id for sub_id, _, _, _ in due])
+            
+            report['chunks'] += 1
+            report['invoiced'] += len(invoices)
+            report['amount'] += sum(invoice['amount'] for invoice in invoices)
+        
+        report['as_of'] = now.isoformat()
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+    
+    @staticmethod
+    def mark_invoice_paid(invoice, stripe_payment_intent_id=None, commit=True):
+        """Mark an invoice as paid (commit=False lets batch callers commit once)"""
         invoice.status = 'paid'
         invoice.paid_at = datetime.utcnow()
         invoice.stripe_payment_intent_id = stripe_payment_intent_id
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
         return invoice
     
     @staticmethod
     def get_subscription_usage(subscription):
-        """Get current billing period usage"""
-        plan = subscription.plan
-        
-        # Get company count
-        from app.services.subscription_service import SubscriptionService
-        company_count = SubscriptionService.get_company_count(subscription)
-        
-        # Calculate overage
-        included = plan.companies_included
-        extra_companies = max(0, company_count - included) if included != -1 else 0
-        
-        # Get pending charges
-        pending_charges = UsageCharge.query.filter_by(
+        """Get current billing period usage (materialized; see UsageService)"""
+        return UsageService.get_usage(subscription)
+    
+    @staticmethod
+    def get_pending_charges(subscription):
+        """Un-invoiced usage charges, newest first"""
+        return UsageCharge.query.filter_by(
             subscription_id=subscription.id,
             invoiced=False
-        ).all()
-        
-        return {
-            'company_count': company_count,
-            'companies_included': included,
-            'extra_companies': extra_companies,
-            'pending_charges': pending_charges,
-            'pending_amount': sum(c.amount for c in pending_charges)
-        }
+        ).order_by(UsageCharge.charged_at.desc()).all()
@@ -0,0 +1,482 @@
+import io
+import time
+from calendar import monthrange
+from datetime import date, datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.models import db, Company, ComplianceMaster, ComplianceOverride, ComplianceRecord
+from app.utils.api_cache import mark_changed
+from app.services.metrics_service import MetricsService
+
+RECORD_COLUMNS = (
+    'company_id', 'compliance_id', 'status', 'due_date',
+    'financial_year', 'period_start', 'created_at', 'updated_at'
+)
+
+def _shift_month(year, month, delta):
+    """Return (year, month) moved by delta months"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+def _safe_date(year, month, day):
+    """Build a date, clamping the day to the end of the month"""
+    return date(year, month, min(day, monthrange(year, month)[1]))
+
+def parse_financial_year(financial_year):
+    """Parse "2023-2024" (or a plain start year) into its start year"""
+    if isinstance(financial_year, int):
+        return financial_year
+    return int(str(financial_year).split('-')[0])
+
+def format_financial_year(start_year):
+    return f"{start_year}-{start_year + 1}"
+
+def parse_base_due_date(base_due_date):
+    """Parse "DD" or "DD-MM" into (day, month); month is None for "DD" """
+    if not base_due_date:
+        return None
+    parts = base_due_date.strip().split('-')
+    try:
+        day = int(parts[0])
+        month = int(parts[1]) if len(parts) > 1 else None
+    except ValueError:
+        return None
+    if not 1 <= day <= 31 or (month is not None and not 1 <= month <= 12):
+        return None
+    return day, month
+
+class CalendarService:
+    """Expands ComplianceMaster rules into ComplianceRecord rows"""
+
+    @staticmethod
+    def expand_master(master, financial_year):
+        """
+        Expand one master rule into its periods for a financial year (April-March).
+        Returns a list of (period_start, base_due_date) tuples.
+        """
+        parsed = parse_base_due_date(master.base_due_date)
+        if not parsed:
+            return []
+        day, month = parsed
+        start_year = parse_financial_year(financial_year)
+        frequency = (master.frequency or '').lower()
+
+        periods = []
+        if frequency == 'monthly':
+            # Due on DD of the month following each period month
+            for i in range(12):
+                period_year, period_month = _shift_month(start_year, 4, i)
+                due_year, due_month = _shift_month(period_year, period_month, 1)
+                periods.append((date(period_year, period_month, 1),
+                                _safe_date(due_year, due_month, day)))
+        elif frequency == 'quarterly':
+            # "DD-MM" is the Q1 due date, later quarters follow every 3 months
+            if month:
+                first_year = start_year if month >= 4 else start_year + 1
+                first_month = month
+            else:
+                first_year, first_month = start_year, 7
+            for q in range(4):
+                period_year, period_month = _shift_month(start_year, 4, q * 3)
+                due_year, due_month = _shift_month(first_year, first_month, q * 3)
+                periods.append((date(period_year, period_month, 1),
+                                _safe_date(due_year, due_month, day)))
+        elif frequency in ('annually', 'annual', 'yearly'):
+            # Annual returns fall due in the year the financial year closes
+            periods.append((date(start_year, 4, 1),
+                            _safe_date(start_year + 1, month or 4, day)))
+        return periods
+
+    @staticmethod
+    def override_targets(periods, override):
+        """
+        Resolve which periods an override moves.
+        An override extends the latest period whose base due date falls on or
+        before the new due date, in the new due date's own year; a one-off
+        override uses its new_due_date exactly as given. Permanent overrides
+        also repeat the same day/month for every later year in ``periods``
+        (from the override year, if that is later).
+        Returns a list of (period_start, new_due_date) tuples.
+        """
+        new_due = override.new_due_date
+        if override.is_permanent:
+            first_year = max(override.year, new_due.year)
+            years = sorted({due.year for _, due in periods if due.year >= first_year})
+        else:
+            years = [new_due.year]
+
+        targets = []
+        for year in years:
+            target_due = new_due if year == new_due.year else _safe_date(year, new_due.month, new_due.day)
+            candidates = [
+                (due, start) for start, due in periods
+                if due.year == year and due <= target_due
+            ]
+            if candidates:
+                _, period_start = max(candidates)
+                targets.append((period_start, target_due))
+        return targets
+
+    @staticmethod
+    def resolve_due_dates(master, financial_years, overrides=None):
+        """
+        Expand a master across financial years and apply its overrides.
+        Returns a list of (financial_year, period_start, due_date) tuples.
+        """
+        periods = []
+        for fy in financial_years:
+            start_year = parse_financial_year(fy)
+            for period_start, due in CalendarService.expand_master(master, start_year):
+                periods.append((format_financial_year(start_year), period_start, due))
+
+        if overrides is None:
+            overrides = master.overrides.all()
+
+        # Permanent rules first, then one-off extensions; later rows win
+        ordered = sorted(overrides, key=lambda o: (
+            not o.is_permanent, o.created_at or datetime.min, o.id or 0
+        ))
+        base = [(start, due) for _, start, due in periods]
+        moved = {}
+        for override in ordered:
+            for period_start, new_due in CalendarService.override_targets(base, override):
+                moved[period_start] = new_due
+
+        return [
+            (fy, period_start, moved.get(period_start, due))
+            for fy, period_start, due in periods
+        ]
+
+    @staticmethod
+    def adopt_legacy_records(master_ids=None):
+        """
+        Give records created before period_start existed (period_start IS
+        NULL) the period their due date belongs to, so generation treats
+        them as existing and overrides move them.
+        A due date maps to its period through the master rule, with and
+        without overrides; per company and period only the oldest legacy
+        record is adopted, and never where the period already has a record.
+        Returns the number of records adopted.
+        """
+        legacy = db.session.query(
+            ComplianceRecord.compliance_id,
+            db.func.min(ComplianceRecord.due_date),
+            db.func.max(ComplianceRecord.due_date)
+        ).filter(ComplianceRecord.period_start == None)
+        if master_ids is not None:
+            legacy = legacy.filter(ComplianceRecord.compliance_id.in_(list(master_ids)))
+
+        adopted = 0
+        for compliance_id, first_due, last_due in legacy.group_by(ComplianceRecord.compliance_id).all():
+            master = db.session.get(ComplianceMaster, compliance_id)
+            if master is None or first_due is None:
+                continue
+            # Dues in year Y belong to the financial years starting in Y-1 and Y
+            financial_years = list(range(first_due.year - 1, last_due.year + 1))
+            periods = {}
+            for fy in financial_years:
+                for period_start, due in CalendarService.expand_master(master, fy):
+                    periods[due] = period_start
+            for _, period_start, due in CalendarService.resolve_due_dates(master, financial_years):
+                periods[due] = period_start
+            if not periods:
+                continue
+
+            other = db.aliased(ComplianceRecord)
+            oldest = db.select(db.func.min(other.id)).where(
+                other.compliance_id == compliance_id,
+                other.period_start == None,
+                other.due_date.in_(list(periods))
+            ).group_by(other.company_id, db.case(periods, value=other.due_date))
+            period = db.case(periods, value=ComplianceRecord.due_date)
+            taken = db.exists().where(
+                other.company_id == ComplianceRecord.company_id,
+                other.compliance_id == compliance_id,
+                other.period_start == period
+            )
+            adopted += db.session.execute(
+                db.update(ComplianceRecord).where(
+                    ComplianceRecord.id.in_(oldest),
+                    ~taken
+                ).values(period_start=period).execution_options(synchronize_session=False)
+            ).rowcount
+        return adopted
+
+    @staticmethod
+    def generate_calendar(financial_years, company_ids=None, chunk_size=500):
+        """
+        Generate compliance records for every active master and active company.
+        Due dates are computed once per master, then crossed with company ids
+        and written with bulk inserts that skip rows that already exist.
+        Each company chunk commits on its own, so a crashed run can be re-run.
+        """
+        started = time.perf_counter()
+        if isinstance(financial_years, (str, int)):
+            financial_years = [financial_years]
+
+        masters = ComplianceMaster.query.filter_by(is_active=True).all()
+        # Records from before period_start would otherwise be inserted again
+        if masters and CalendarService.adopt_legacy_records([m.id for m in masters]):
+            db.session.commit()
+        overrides = {}
+        if masters:
+            for override in ComplianceOverride.query.filter(
+                ComplianceOverride.compliance_id.in_([m.id for m in masters])
+            ).all():
+                overrides.setdefault(override.compliance_id, []).append(override)
+
+        schedule = []
+        for master in masters:
+            for fy, period_start, due in CalendarService.resolve_due_dates(
+                master, financial_years, overrides.get(master.id, [])
+            ):
+                schedule.append((master.id, fy, period_start, due))
+
+        if company_ids is None:
+            company_ids = [
+                row[0] for row in db.session.query(Company.id).filter(
+                    Company.is_active == True
+                ).order_by(Company.id).all()
+            ]
+
+        now = datetime.utcnow()
+        candidates = 0
+        inserted = 0
+        for i in range(0, len(company_ids), chunk_size):
+            chunk = company_ids[i:i + chunk_size]
+            rows = [
+                {
+                    'company_id': company_id,
+                    'compliance_id': compliance_id,
+                    'status': 'Pending',
+                    'due_date': due,
+                    'financial_year': fy,
+                    'period_start': period_start,
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for company_id in chunk
+                for compliance_id, fy, period_start, due in schedule
+            ]
+            if not rows:
+                continue
+            candidates += len(rows)
+            chunk_inserted = CalendarService._bulk_insert(rows, chunk)
+            MetricsService.increment({'active_compliances': chunk_inserted})
+            inserted += chunk_inserted
+            db.session.commit()
+
+        return {
+            'financial_years': [format_financial_year(parse_financial_year(fy)) for fy in financial_years],
+            'companies': len(company_ids),
+            'masters': len(masters),
+            'candidates': candidates,
+            'inserted': inserted,
+            'skipped': candidates - inserted,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    @staticmethod
+    def propagate_override(override, previous=None):
+        """
+        Apply a new or changed override to existing open records only.
+
+        ``previous`` is the override's prior state (any object with year,
+        new_due_date and is_permanent) when an existing override was edited,
+        so periods it used to move are recomputed too. Due dates are resolved
+        from the master rule plus all of its current overrides, then written
+        with one set-based UPDATE keyed on (compliance_id, period_start).
+        Overdue records whose new due date has not passed go back to Pending.
+        Returns a diff summary of the periods and companies that changed.
+        """
+        started = time.perf_counter()
+        master = db.session.get(ComplianceMaster, override.compliance_id)
+        CalendarService.adopt_legacy_records([master.id])
+        versions = [override] + ([previous] if previous is not None else [])
+
+        # Dues in year Y belong to the financial years starting in Y-1 and Y
+        years = [y for v in versions for y in (v.year, v.new_due_date.year)]
+        first_year = min(years) - 1
+        last_year = max(years)
+        if any(v.is_permanent for v in versions):
+            latest_period = db.session.query(db.func.max(ComplianceRecord.period_start)).filter(
+                ComplianceRecord.compliance_id == master.id
+            ).scalar()
+            if latest_period:
+                last_year = max(last_year, latest_period.year if latest_period.month >= 4 else latest_period.year - 1)
+        financial_years = list(range(first_year, last_year + 1))
+
+        base = []
+        for fy in financial_years:
+            base.extend(CalendarService.expand_master(master, fy))
+        affected = set()
+        for version in versions:
+            affected.update(start for start, _ in CalendarService.override_targets(base, version))
+
+        resolved = {
+            period_start: due
+            for _, period_start, due in CalendarService.resolve_due_dates(master, financial_years)
+            if period_start in affected
+        }
+
+        summary = {
+            'compliance_id': master.id,
+            'periods': [
+                {'period_start': start.isoformat(), 'due_date': due.isoformat()}
+                for start, due in sorted(resolved.items())
+            ],
+            'updated': 0,
+            'company_ids': [],
+            'elapsed_ms': 0
+        }
+        if not resolved:
+            return summary
+
+        today = date.today()
+        new_due = db.case(resolved, value=ComplianceRecord.period_start)
+        reopened = [start for start, due in resolved.items() if due >= today]
+        stmt = db.update(ComplianceRecord).where(
+            ComplianceRecord.compliance_id == master.id,
+            ComplianceRecord.period_start.in_(list(resolved)),
+            ComplianceRecord.status.in_(['Pending', 'Overdue']),
+            ComplianceRecord.due_date != new_due
+        ).values(
+            due_date=new_due,
+            status=db.case(
+                (ComplianceRecord.period_start.in_(reopened), 'Pending'),
+                else_=ComplianceRecord.status
+            ) if reopened else ComplianceRecord.status,
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+
+        if reopened:
+            # The bulk UPDATE skips the ORM listeners that keep metrics current
+            reopening = db.session.query(db.func.count(ComplianceRecord.id)).filter(
+                stmt.whereclause,
+                ComplianceRecord.status == 'Overdue',
+                ComplianceRecord.period_start.in_(reopened)
+            ).scalar()
+            MetricsService.increment({'active_compliances': reopening})
+
+        if db.session.get_bind().dialect.update_returning:
+            changed = db.session.execute(
+                stmt.returning(ComplianceRecord.company_id)
+            ).all()
+            company_ids = [row[0] for row in changed]
+        else:
+            company_ids = [row[0] for row in db.session.query(ComplianceRecord.company_id).filter(
+                stmt.whereclause
+            ).all()]
+            db.session.execute(stmt)
+
+        summary['updated'] = len(company_ids)
+        summary['company_ids'] = sorted(set(company_ids))
+        summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return summary
+
+    @staticmethod
+    def mark_overdue(today=None, batch_size=5000):
+        """
+        Flip Pending records whose due date has passed to Overdue.
+        Works in batches of ids picked through the (status, due_date) index
+        with FOR UPDATE SKIP LOCKED, so concurrent sweeps on several workers
+        split the rows instead of blocking on each other. Each batch commits
+        on its own to keep transactions and lock times short.
+        """
+        started = time.perf_counter()
+        today = today or date.today()
+        updated = 0
+        batches = 0
+
+        while True:
+            batch_ids = db.select(ComplianceRecord.id).where(
+                ComplianceRecord.status == 'Pending',
+                ComplianceRecord.due_date < today
+            ).limit(batch_size).with_for_update(skip_locked=True).scalar_subquery()
+
+            result = db.session.execute(
+                db.update(ComplianceRecord).where(
+                    ComplianceRecord.id.in_(batch_ids),
+                    ComplianceRecord.status == 'Pending'
+                ).values(
+                    status='Overdue',
+                    updated_at=datetime.utcnow()
+                ).execution_options(synchronize_session=False)
+            )
+            MetricsService.increment({'active_compliances': -result.rowcount})
+            db.session.commit()
+
+            batches += 1
+            updated += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+        return {
+            'updated': updated,
+            'batches': batches,
+            'as_of': today.isoformat(),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    @staticmethod
+    def _bulk_insert(rows, company_ids):
+        """Insert rows, skipping (company, compliance, period) keys that exist"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return CalendarService._copy_insert(rows)
+
+        table = ComplianceRecord.__table__
+        conflict_keys = ['company_id', 'compliance_id', 'period_start']
+        if dialect == 'sqlite':
+            before = db.session.query(db.func.count(ComplianceRecord.id)).filter(
+                ComplianceRecord.company_id.in_(company_ids)
+            ).scalar()
+            stmt = sqlite_insert(table).on_conflict_do_nothing(index_elements=conflict_keys)
+            db.session.execute(stmt, rows)
+            after = db.session.query(db.func.count(ComplianceRecord.id)).filter(
+                ComplianceRecord.company_id.in_(company_ids)
+            ).scalar()
+            return after - before
+
+        # Generic fallback: filter out existing keys with one query per chunk
+        existing = set(db.session.query(
+            ComplianceRecord.company_id,
+            ComplianceRecord.compliance_id,
+            ComplianceRecord.period_start
+        ).filter(ComplianceRecord.company_id.in_(company_ids)).all())
+        rows = [r for r in rows if (r['company_id'], r['compliance_id'], r['period_start']) not in existing]
+        if rows:
+            db.session.execute(table.insert(), rows)
+        return len(rows)
+
+    @staticmethod
+    def _copy_insert(rows):
+        """Stream rows into a temp table with COPY, then INSERT ... ON CONFLICT DO NOTHING"""
+        columns = ', '.join(RECORD_COLUMNS)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS compliance_record_stage ("
+                "company_id integer, compliance_id integer, status varchar(20), "
+                "due_date date, financial_year varchar(9), period_start date, "
+                "created_at timestamp, updated_at timestamp) ON COMMIT DELETE ROWS"
+            )
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(str(row[c]) for c in RECORD_COLUMNS))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY compliance_record_stage ({columns}) FROM STDIN", buffer
+            )
+            cursor.execute(
+                f"INSERT INTO compliance_record ({columns}) "
+                f"SELECT {columns} FROM compliance_record_stage "
+                f"ON CONFLICT (company_id, compliance_id, period_start) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute("TRUNCATE compliance_record_stage")
+            # Raw COPY bypasses the session events that invalidate API caches
+            mark_changed(db.session, 'records', 'stats')
+            return inserted
+        finally:
+            cursor.close()
@@ -0,0 +1,97 @@
+import base64
+from datetime import date
+from app.models import db, ComplianceRecord, ComplianceMaster
+
+class ComplianceService:
+    """Read paths over compliance records for the JSON API"""
+
+    # Selectable fields for ?fields=; name/category come from the master row
+    FIELDS = {
+        'id': ComplianceRecord.id,
+        'name': ComplianceMaster.name,
+        'category': ComplianceMaster.category,
+        'compliance_id': ComplianceRecord.compliance_id,
+        'due_date': ComplianceRecord.due_date,
+        'status': ComplianceRecord.status,
+        'financial_year': ComplianceRecord.financial_year,
+        'period_start': ComplianceRecord.period_start,
+        'completed_date': ComplianceRecord.completed_date,
+    }
+    DEFAULT_FIELDS = ('id', 'name', 'due_date', 'status', 'financial_year')
+    MASTER_FIELDS = ('name', 'category')
+
+    @staticmethod
+    def encode_cursor(due_date, record_id):
+        raw = f"{due_date.isoformat()}|{record_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Return (due_date, id) from a cursor, or raise ValueError"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            due_date, record_id = raw.split('|')
+            return date.fromisoformat(due_date), int(record_id)
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def parse_fields(fields):
+        """Validate a comma-separated field list; None selects the defaults"""
+        if not fields:
+            return list(ComplianceService.DEFAULT_FIELDS)
+        selected = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in selected if f not in ComplianceService.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return selected
+
+    @staticmethod
+    def page_records(company_id, fields=None, cursor=None, limit=100, status=None,
+                     financial_year=None, due_from=None, due_to=None):
+        """
+        One page of a company's compliance records ordered by (due_date, id).
+
+        Uses keyset pagination: the cursor holds the last (due_date, id)
+        seen, so every page is a single index range scan on
+        (company_id, due_date, id) no matter how deep the client pages.
+        The master name is joined in the same query, only when requested.
+
+        Returns:
+            (rows, next_cursor) with next_cursor None on the last page
+        """
+        fields = fields or list(ComplianceService.DEFAULT_FIELDS)
+        columns = [ComplianceService.FIELDS[f].label(f) for f in fields]
+        # The cursor needs due_date and id even when they are not projected
+        columns += [ComplianceRecord.due_date.label('_due_date'), ComplianceRecord.id.label('_id')]
+
+        query = db.session.query(*columns).filter(ComplianceRecord.company_id == company_id)
+        if any(f in ComplianceService.MASTER_FIELDS for f in fields):
+            query = query.join(ComplianceMaster, ComplianceMaster.id == ComplianceRecord.compliance_id)
+
+        if status:
+            query = query.filter(ComplianceRecord.status == status)
+        if financial_year:
+            query = query.filter(ComplianceRecord.financial_year == financial_year)
+        if due_from:
+            query = query.filter(ComplianceRecord.due_date >= due_from)
+        if due_to:
+            query = query.filter(ComplianceRecord.due_date <= due_to)
+        if cursor:
+            last_due, last_id = ComplianceService.decode_cursor(cursor)
+            query = query.filter(db.or_(
+                ComplianceRecord.due_date > last_due,
+                db.and_(ComplianceRecord.due_date == last_due, ComplianceRecord.id > last_id)
+            ))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(ComplianceRecord.due_date, ComplianceRecord.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = ComplianceService.encode_cursor(rows[-1]._due_date, rows[-1]._id)
+
+        return [{
+            f: value.isoformat() if isinstance(value, date) else value
+            for f, value in zip(fields, row)
+        } for row in rows], next_cursor
@@ -0,0 +1,142 @@
+import os
+import hashlib
+import tempfile
+from flask import current_app, request, abort
+from werkzeug.utils import send_file
+from app.models import db, Document
+
+class DocumentService:
+    """
+    Content-addressed document storage.
+
+    Uploads are streamed to disk in fixed-size chunks while a SHA-256 is
+    computed, then moved into UPLOAD_FOLDER/blobs/<aa>/<bb>/<sha256>.
+    Identical files share one blob; each upload still gets its own
+    Document row pointing at it.
+    """
+
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+    @staticmethod
+    def blob_path(content_hash):
+        """Path of the blob for a SHA-256 hex digest"""
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs',
+                            content_hash[:2], content_hash[2:4], content_hash)
+
+    @staticmethod
+    def store_stream(stream, chunk_size=None):
+        """
+        Write a stream into the blob store.
+        Memory use is bounded by chunk_size regardless of the file size.
+
+        Returns:
+            (content_hash, size, path, created) where created is False
+            when an identical blob already existed
+        """
+        chunk_size = chunk_size or current_app.config.get('UPLOAD_CHUNK_SIZE', DocumentService.DEFAULT_CHUNK_SIZE)
+        staging_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+        os.makedirs(staging_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        # Stage next to the blob store so the final move is an atomic rename
+        fd, staging_path = tempfile.mkstemp(dir=staging_dir)
+        try:
+            with os.fdopen(fd, 'wb') as staging:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    staging.write(chunk)
+                    size += len(chunk)
+
+            content_hash = digest.hexdigest()
+            path = DocumentService.blob_path(content_hash)
+            if os.path.exists(path):
+                os.remove(staging_path)
+                return content_hash, size, path, False
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(staging_path, path)
+            return content_hash, size, path, True
+        except Exception:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+    @staticmethod
+    def save_upload(company, file, user_id=None, compliance_record_id=None):
+        """
+        Store an uploaded FileStorage and create its Document row.
+
+        Returns:
+            (document, created) where created is False for a deduplicated blob
+        """
+        content_hash, size, path, created = DocumentService.store_stream(file.stream)
+
+        doc = Document(
+            company_id=company.id,
+            compliance_record_id=compliance_record_id,
+            filename=file.filename,
+            file_path=path,
+            file_size=size,
+            content_hash=content_hash,
+            mime_type=file.content_type,
+            uploaded_by=user_id
+        )
+        db.session.add(doc)
+        db.session.commit()
+        return doc, created
+
+    @staticmethod
+    def download_response(doc, as_attachment=True):
+        """
+        Build a response for a Document without copying it through Python.
+
+        DOCUMENT_SENDFILE selects who moves the bytes:
+            'x-accel'    - nginx, via X-Accel-Redirect to DOCUMENT_ACCEL_PREFIX
+            'x-sendfile' - Apache/lighttpd, via X-Sendfile
+            ''           - the WSGI server's file wrapper (os.sendfile under gunicorn)
+        Range, ETag and If-None-Match are honoured in every mode. Blobs use
+        their content hash as a strong ETag, so no stat or rehash is needed.
+        """
+        backend = current_app.config.get('DOCUMENT_SENDFILE', '')
+        etag = doc.content_hash or True
+        max_age = current_app.config.get('DOCUMENT_MAX_AGE', 3600)
+
+        if backend == 'x-accel':
+            upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+            relative = os.path.relpath(os.path.abspath(doc.file_path), upload_folder)
+            if relative.startswith('..'):
+                abort(404)
+            response = current_app.response_class(mimetype=doc.mime_type or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = (
+                current_app.config.get('DOCUMENT_ACCEL_PREFIX', '/protected-uploads/').rstrip('/')
+                + '/' + relative.replace(os.sep, '/')
+            )
+            response.headers.set('Content-Disposition',
+                                 'attachment' if as_attachment else 'inline', filename=doc.filename)
+            if doc.content_hash:
+                response.set_etag(doc.content_hash)
+            response.cache_control.private = True
+            response.cache_control.max_age = max_age
+            # nginx serves the body and the Range; answer conditionals here
+            return response.make_conditional(request)
+
+        if not os.path.exists(doc.file_path):
+            abort(404)
+        response = send_file(
+            doc.file_path,
+            request.environ,
+            mimetype=doc.mime_type,
+            as_attachment=as_attachment,
+            download_name=doc.filename,
+            conditional=True,
+            etag=etag,
+            max_age=max_age,
+            use_x_sendfile=backend == 'x-sendfile',
+            response_class=current_app.response_class
+        )
+        response.cache_control.private = True
+        return response
@@ -0,0 +1,170 @@
+import os
+import pandas as pd
+from datetime import datetime
+from app.models import db, Company
+from app.utils.validators import validate_many
+
+class CompanyImportService:
+    """Bulk company onboarding from CSV/XLSX files"""
+
+    COLUMNS = ('name', 'pan', 'gstin', 'cin')
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def read_file(file):
+        """Load an uploaded CSV or XLSX into a DataFrame of stripped strings"""
+        ext = os.path.splitext(file.filename or '')[1].lower()
+        if ext in ('.xlsx', '.xlsm'):
+            df = pd.read_excel(file.stream, engine='openpyxl', dtype=str)
+        elif ext == '.csv':
+            df = pd.read_csv(file.stream, dtype=str, keep_default_na=False)
+        else:
+            raise ValueError('Upload a .csv or .xlsx file')
+
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        if 'name' not in df.columns:
+            raise ValueError('Missing required column: name')
+        for column in CompanyImportService.COLUMNS:
+            if column not in df.columns:
+                df[column] = ''
+        df = df[list(CompanyImportService.COLUMNS)].fillna('')
+        for column in CompanyImportService.COLUMNS:
+            df[column] = df[column].astype(str).str.strip()
+        return df
+
+    @staticmethod
+    def validate(df, practitioner_id):
+        """
+        Validate every row in one vectorized pass (batch validators, column masks).
+        PAN is taken from GSTIN when missing and must match it otherwise.
+        Duplicates are checked within the file and against existing
+        companies (CIN globally, PAN per practitioner) with a single query.
+
+        Returns:
+            (df, errors) where df has normalized identifiers and errors maps
+            row index to a list of messages
+        """
+        df = df.copy()
+        for column in ('pan', 'gstin', 'cin'):
+            df[column] = df[column].str.upper()
+
+        has_gstin = df['gstin'] != ''
+        has_cin = df['cin'] != ''
+        gstin_ok = pd.Series(validate_many(df['gstin'], 'gstin'), index=df.index)
+        gstin_pan = df['gstin'].str[2:12].where(has_gstin & gstin_ok, '')
+
+        pan_mismatch = (df['pan'] != '') & (gstin_pan != '') & (df['pan'] != gstin_pan)
+        df['pan'] = df['pan'].where(df['pan'] != '', gstin_pan)
+
+        checks = [
+            (df['name'] == '', 'Company name is required'),
+            (df['name'].str.len() > 100, 'Company name is longer than 100 characters'),
+            (has_gstin & ~gstin_ok, 'Invalid GSTIN'),
+            (pan_mismatch, 'Provided PAN does not match GSTIN'),
+            (~pd.Series(validate_many(df['pan'], 'pan'), index=df.index), 'Invalid PAN format'),
+            (~pd.Series(validate_many(df['cin'], 'cin'), index=df.index), 'Invalid CIN format'),
+            (has_cin & df['cin'].duplicated(keep='first'), 'Duplicate CIN in file'),
+            ((df['pan'] != '') & df['pan'].duplicated(keep='first'), 'Duplicate PAN in file'),
+        ]
+
+        # One set-based lookup for identifiers that already exist
+        cins = df.loc[has_cin, 'cin'].unique().tolist()
+        pans = df.loc[df['pan'] != '', 'pan'].unique().tolist()
+        existing_cins, existing_pans = set(), set()
+        if cins or pans:
+            for cin, pan, owner_id in db.session.query(Company.cin, Company.pan, Company.practitioner_id).filter(
+                db.or_(
+                    Company.cin.in_(cins),
+                    db.and_(Company.pan.in_(pans), Company.practitioner_id == practitioner_id)
+                )
+            ).all():
+                if cin in cins:
+                    existing_cins.add(cin)
+                if owner_id == practitioner_id:
+                    existing_pans.add(pan)
+        checks.append((df['cin'].isin(existing_cins), 'CIN already registered'))
+        checks.append((df['pan'].isin(existing_pans), 'A company with this PAN already exists'))
+
+        errors = {}
+        for mask, message in checks:
+            for index in df.index[mask.fillna(False).astype(bool)]:
+                errors.setdefault(index, []).append(message)
+        return df, errors
+
+    @staticmethod
+    def import_companies(file, practitioner, subscription=None, dry_run=False):
+        """
+        Validate and insert companies from an uploaded file.
+        Rows are inserted in batches within one transaction; plan-limit
+        billing is worked out once for the whole import and recorded as a
+        single usage charge in the same commit.
+
+        Returns:
+            Report dict with counts, per-row errors and the extra charge
+        """
+        df, errors = CompanyImportService.validate(
+            CompanyImportService.read_file(file), practitioner.id
+        )
+        valid = df.drop(index=list(errors))
+
+        report = {
+            'total': len(df),
+            'valid': len(valid),
+            'imported': 0,
+            'failed': len(errors),
+            'dry_run': dry_run,
+            # Row numbers as shown in a spreadsheet (header is row 1)
+            'errors': [
+                {'row': int(index) + 2, 'name': df.at[index, 'name'], 'errors': messages}
+                for index, messages in sorted(errors.items())
+            ],
+            'extra_companies': 0,
+            'charge': None
+        }
+        if valid.empty or dry_run:
+            return report
+
+        extra = 0
+        if subscription:
+            from app.services.subscription_service import SubscriptionService
+            included = subscription.plan.companies_included
+            if included != -1:
+                current = SubscriptionService.get_company_count(subscription)
+                extra = max(0, current + len(valid) - max(current, included))
+
+        now = datetime.utcnow()
+        rows = [{
+            'name': row.name,
+            'pan': row.pan,
+            'gstin': row.gstin or None,
+            'cin': row.cin or None,
+            'practitioner_id': practitioner.id,
+            'is_active': True,
+            'created_at': now
+        } for row in valid.itertuples(index=False)]
+
+        from app.services.billing_service import BillingService
+        from app.services.metrics_service import MetricsService
+        from app.services.usage_service import UsageService
+        # One transaction: the companies and their extra-company charge
+        # are committed together or not at all
+        try:
+            batch_size = CompanyImportService.BATCH_SIZE
+            for start in range(0, len(rows), batch_size):
+                db.session.execute(db.insert(Company), rows[start:start + batch_size])
+            MetricsService.increment({'total_companies': len(rows)})
+            UsageService.refresh(practitioner_ids=[practitioner.id])
+            if extra:
+                # create_usage_charge commits the whole import
+                charge = BillingService.charge_extra_companies(
+                    subscription, extra, f"Additional companies: bulk import of {len(rows)}"
+                )
+                report['extra_companies'] = extra
+                report['charge'] = charge.amount
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report['imported'] = len(rows)
+        return report
@@ -0,0 +1,185 @@
+from datetime import datetime
+from sqlalchemy import event
+from app.models import (db, User, Company, Subscription, SubscriptionPlan, Invoice,
+                        ComplianceRecord, MetricSnapshot)
+
+PRACTITIONER_ROLES = ('practitioner_admin', 'practitioner_staff')
+
+# Columns whose changes move a metric, per model
+TRACKED = {
+    User: ('role',),
+    Company: (),
+    Subscription: ('status', 'plan_id'),
+    Invoice: ('status', 'amount'),
+    ComplianceRecord: ('status',),
+}
+
+def _contributions(model, values):
+    """What one row with these column values adds to each metric"""
+    if model is User:
+        return {'total_users': 1, 'total_practitioners': int(values['role'] in PRACTITIONER_ROLES)}
+    if model is Company:
+        return {'total_companies': 1}
+    if model is Subscription:
+        if values['status'] != 'active':
+            return {}
+        return {'active_subscriptions': 1, f"plan:{values['plan_id']}": 1}
+    if model is Invoice:
+        return {'total_revenue': values['amount'] or 0} if values['status'] == 'paid' else {}
+    if model is ComplianceRecord:
+        return {'active_compliances': int(values['status'] == 'Pending')}
+    return {}
+
+class MetricsService:
+    """
+    Materialized admin metrics.
+
+    A periodic task recounts everything into metric_snapshot; between
+    recounts, ORM writes adjust the affected rows in the same transaction
+    (see register_metric_listeners) and set-based paths call increment.
+    Readers get every metric with one primary-key table scan.
+    """
+
+    @staticmethod
+    def compute():
+        """Recount every metric in one round trip"""
+        count = db.func.count
+        totals = db.session.execute(db.select(
+            db.select(count(User.id)).scalar_subquery().label('total_users'),
+            db.select(count(User.id)).where(User.role.in_(PRACTITIONER_ROLES)).scalar_subquery().label('total_practitioners'),
+            db.select(count(Company.id)).scalar_subquery().label('total_companies'),
+            db.select(count(Subscription.id)).where(Subscription.status == 'active').scalar_subquery().label('active_subscriptions'),
+            db.select(db.func.coalesce(db.func.sum(Invoice.amount), 0)).where(Invoice.status == 'paid').scalar_subquery().label('total_revenue'),
+            db.select(count(ComplianceRecord.id)).where(ComplianceRecord.status == 'Pending').scalar_subquery().label('active_compliances'),
+        )).mappings().one()
+
+        metrics = {name: (None, float(value)) for name, value in totals.items()}
+        plans = db.session.query(
+            SubscriptionPlan.id,
+            SubscriptionPlan.name,
+            count(Subscription.id)
+        ).outerjoin(Subscription, db.and_(
+            Subscription.plan_id == SubscriptionPlan.id,
+            Subscription.status == 'active'
+        )).group_by(SubscriptionPlan.id, SubscriptionPlan.name).all()
+        for plan_id, plan_name, active in plans:
+            metrics[f"plan:{plan_id}"] = (plan_name, float(active))
+        return metrics
+
+    @staticmethod
+    def refresh():
+        """Rewrite the snapshot from a full recount"""
+        now = datetime.utcnow()
+        metrics = MetricsService.compute()
+        for name, (label, value) in metrics.items():
+            db.session.merge(MetricSnapshot(
+                name=name, label=label, value=value, refreshed_at=now, updated_at=now
+            ))
+        # Drop rows for plans that no longer exist
+        db.session.query(MetricSnapshot).filter(
+            ~MetricSnapshot.name.in_(list(metrics))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return {'metrics': len(metrics), 'refreshed_at': now.isoformat()}
+
+    @staticmethod
+    def get_snapshot():
+        """
+        All metrics from one query, refreshing first if the table is empty.
+        Returns totals, the active-subscription plan distribution and the
+        time of the last full recount (``refreshed_at``).
+        """
+        rows = MetricSnapshot.query.all()
+        if not rows:
+            MetricsService.refresh()
+            rows = MetricSnapshot.query.all()
+
+        snapshot = {'plans': [], 'refreshed_at': None, 'updated_at': None}
+        for row in rows:
+            if row.name.startswith('plan:'):
+                snapshot['plans'].append((row.label, int(row.value)))
+            else:
+                snapshot[row.name] = row.value if row.name == 'total_revenue' else int(row.value)
+            if snapshot['refreshed_at'] is None or row.refreshed_at < snapshot['refreshed_at']:
+                snapshot['refreshed_at'] = row.refreshed_at
+            if snapshot['updated_at'] is None or row.updated_at > snapshot['updated_at']:
+                snapshot['updated_at'] = row.updated_at
+        snapshot['plans'].sort()
+        return snapshot
+
+    @staticmethod
+    def increment(deltas, connection=None):
+        """
+        Apply metric deltas, e.g. {'total_companies': 25}. Runs in the
+        caller's transaction so it commits or rolls back with the write.
+        Missing rows are skipped; the next refresh creates them.
+        """
+        now = datetime.utcnow()
+        execute = connection.execute if connection is not None else db.session.execute
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            execute(db.update(MetricSnapshot).where(MetricSnapshot.name == name).values(
+                value=MetricSnapshot.value + delta,
+                updated_at=now
+            ))
+
+def _values(obj, columns, previous=False):
+    state = db.inspect(obj)
+    values = {}
+    for column in columns:
+        history = state.attrs[column].history if previous else None
+        if history is not None and history.deleted:
+            values[column] = history.deleted[0]
+        else:
+            values[column] = getattr(obj, column)
+    return values
+
+def _add(deltas, contributions, sign):
+    for name, value in contributions.items():
+        deltas[name] = deltas.get(name, 0) + sign * value
+
+def _before_flush(session, flush_context, instances):
+    # Old values of changed and deleted rows must be read before the flush
+    deltas = session.info.setdefault('metric_deltas', {})
+    for obj in session.deleted:
+        columns = TRACKED.get(type(obj))
+        if columns is not None:
+            _add(deltas, _contributions(type(obj), _values(obj, columns, previous=True)), -1)
+    for obj in session.dirty:
+        columns = TRACKED.get(type(obj))
+        if not columns or not session.is_modified(obj):
+            continue
+        _add(deltas, _contributions(type(obj), _values(obj, columns)), 1)
+        _add(deltas, _contributions(type(obj), _values(obj, columns, previous=True)), -1)
+
+def _after_flush(session, flush_context):
+    # New rows are counted after the flush, once column defaults are applied
+    deltas = session.info.pop('metric_deltas', {})
+    for obj in session.new:
+        columns = TRACKED.get(type(obj))
+        if columns is not None:
+            _add(deltas, _contributions(type(obj), _values(obj, columns)), 1)
+    if any(deltas.values()):
+        MetricsService.increment(deltas, connection=session.connection())
+
+def _discard_deltas(session, previous_transaction):
+    # A failed flush must not leave its deltas for the next one
+    session.info.pop('metric_deltas', None)
+
+def _load_old_value(target, value, oldvalue, initiator):
+    # Registered with active_history so the old value of an attribute
+    # expired by a commit is loaded before it is overwritten
+    return value
+
+def register_metric_listeners():
+    """Keep metric_snapshot in step with ORM writes (idempotent)"""
+    for model, columns in TRACKED.items():
+        for column in columns:
+            attribute = getattr(model, column)
+            if not event.contains(attribute, 'set', _load_old_value):
+                event.listen(attribute, 'set', _load_old_value, active_history=True, retval=True)
+    for name, fn in (('before_flush', _before_flush), ('after_flush', _after_flush),
+                     ('after_soft_rollback', _discard_deltas)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
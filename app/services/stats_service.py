@@ -0,0 +1,52 @@
+from sqlalchemy import func
+from app.models import db, Company, ComplianceRecord
+
+STATUS_KEYS = {
+    'Pending': 'pending',
+    'Overdue': 'overdue',
+    'Completed': 'completed'
+}
+
+class StatsService:
+    """Aggregated compliance status counts for dashboards"""
+
+    @staticmethod
+    def _empty_counts():
+        return {'total': 0, 'pending': 0, 'overdue': 0, 'completed': 0}
+
+    @staticmethod
+    def get_practitioner_stats(practitioner_id):
+        """
+        Get per-company and total compliance status counts for a practitioner.
+        Runs a single GROUP BY (company_id, status) query over active companies.
+        """
+        rows = db.session.query(
+            ComplianceRecord.company_id,
+            ComplianceRecord.status,
+            func.count(ComplianceRecord.id)
+        ).join(
+            Company, Company.id == ComplianceRecord.company_id
+        ).filter(
+            Company.practitioner_id == practitioner_id,
+            Company.is_active == True
+        ).group_by(
+            ComplianceRecord.company_id,
+            ComplianceRecord.status
+        ).all()
+
+        totals = StatsService._empty_counts()
+        per_company = {}
+
+        for company_id, status, count in rows:
+            counts = per_company.setdefault(company_id, StatsService._empty_counts())
+            key = STATUS_KEYS.get(status)
+            if key:
+                counts[key] += count
+                totals[key] += count
+            counts['total'] += count
+            totals['total'] += count
+
+        return {
+            'totals': totals,
+            'per_company': per_company
+        }
@@ -0,0 +1,167 @@
+import json
+import time
+from datetime import datetime
+from flask import current_app
+from app.models import db, Invoice, Subscription, StripeEvent
+from app.services.billing_service import BillingService
+from app.services.subscription_service import SubscriptionService
+from app.utils.stripe_events import get_event_queue
+
+INVOICE_EVENTS = ('invoice.paid', 'invoice.payment_succeeded', 'invoice.payment_failed')
+SUBSCRIPTION_EVENTS = ('customer.subscription.created', 'customer.subscription.updated',
+                       'customer.subscription.deleted')
+
+def _timestamp(value):
+    return datetime.utcfromtimestamp(value) if value else None
+
+class StripeWebhookService:
+    """
+    Applies queued Stripe webhook events in batches.
+
+    Each batch is one transaction: event ids already in stripe_event are
+    skipped, the invoices and subscriptions referenced by the rest are
+    loaded with one query each, changes are made on those objects and
+    flushed together with one multi-row insert of the batch's stripe_event
+    rows. An event that cannot be applied is recorded as failed instead of
+    sinking the batch.
+    The queue is trimmed only after the commit, so a crash replays the
+    batch and the event ids make the replay a no-op.
+    """
+
+    @staticmethod
+    def drain(batch_size=None, max_batches=None):
+        """Apply queued events until the queue is empty (one consumer at a time)"""
+        started = time.perf_counter()
+        batch_size = batch_size or current_app.config.get('STRIPE_EVENT_BATCH_SIZE', 100)
+        queue = get_event_queue()
+        report = {'batches': 0, 'processed': 0, 'duplicates': 0, 'ignored': 0, 'failed': 0}
+
+        with queue.drain_lock() as renew:
+            if renew is None:
+                report['locked'] = True
+                return report
+            while max_batches is None or report['batches'] < max_batches:
+                # Stop once the lock has lapsed: trimming by count is only
+                # safe while no other consumer can read the same head
+                if not renew():
+                    report['lock_lost'] = True
+                    break
+                payloads = queue.peek(batch_size)
+                if not payloads:
+                    break
+                counts = StripeWebhookService.process_batch(payloads)
+                report['batches'] += 1
+                for key, value in counts.items():
+                    report[key] += value
+                if not renew():
+                    # Committed; the next drain sees these ids as duplicates
+                    report['lock_lost'] = True
+                    break
+                queue.ack(len(payloads))
+
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+
+    @staticmethod
+    def process_batch(payloads):
+        """Apply one batch of raw event payloads and record their ids"""
+        counts = {'processed': 0, 'duplicates': 0, 'ignored': 0, 'failed': 0}
+        events = {}
+        for payload in payloads:
+            try:
+                event = json.loads(payload)
+                events.setdefault(event['id'], event)
+            except (ValueError, KeyError, TypeError) as e:
+                # Signed by Stripe, so this should not happen; drop it
+                counts['failed'] += 1
+                print(f"Stripe Event Error: unreadable payload: {e}")
+        counts['duplicates'] += len(payloads) - counts['failed'] - len(events)
+
+        seen = {event_id for (event_id,) in db.session.query(StripeEvent.id).filter(
+            StripeEvent.id.in_(list(events))
+        )}
+        counts['duplicates'] += len(seen)
+        # Stripe does not guarantee delivery order; apply oldest first
+        pending = sorted(
+            (event for event_id, event in events.items() if event_id not in seen),
+            key=lambda event: event.get('created') or 0
+        )
+        if not pending:
+            return counts
+
+        objects = [event.get('data', {}).get('object', {}) for event in pending]
+        invoice_ids = [o.get('id') for e, o in zip(pending, objects) if e.get('type') in INVOICE_EVENTS]
+        subscription_ids = [o.get('id') for e, o in zip(pending, objects) if e.get('type') in SUBSCRIPTION_EVENTS]
+        invoices = {i.stripe_invoice_id: i for i in Invoice.query.filter(
+            Invoice.stripe_invoice_id.in_(invoice_ids)
+        )} if invoice_ids else {}
+        subscriptions = {s.stripe_subscription_id: s for s in Subscription.query.filter(
+            Subscription.stripe_subscription_id.in_(subscription_ids)
+        )} if subscription_ids else {}
+
+        records, changed = [], set()
+        for event, obj in zip(pending, objects):
+            status, error = 'processed', None
+            try:
+                target = StripeWebhookService._apply(event['type'], obj, invoices, subscriptions)
+                if target is None:
+                    status = 'ignored'
+                elif isinstance(target, Subscription):
+                    changed.add(target.id)
+            except Exception as e:
+                status, error = 'failed', str(e)[:255]
+                print(f"Stripe Event Error ({event['id']}): {e}")
+            counts[status] += 1
+            records.append({
+                'id': event['id'],
+                'type': event.get('type', '')[:100],
+                'status': status,
+                'error': error,
+                'created_at': _timestamp(event.get('created')),
+                'processed_at': datetime.utcnow()
+            })
+
+        try:
+            db.session.execute(db.insert(StripeEvent), records)
+            db.session.commit()
+        except Exception:
+            # Left on the queue; the next drain retries the batch
+            db.session.rollback()
+            raise
+        for subscription_id in changed:
+            SubscriptionService.invalidate(subscription_id)
+        return counts
+
+    @staticmethod
+    def _apply(event_type, obj, invoices, subscriptions):
+        """Apply one event to the loaded rows; returns the changed row or None"""
+        if event_type in INVOICE_EVENTS:
+            invoice = invoices.get(obj.get('id'))
+            if invoice is None:
+                return None
+            # A late payment_failed must not undo a payment
+            if event_type == 'invoice.payment_failed':
+                if invoice.status != 'paid':
+                    invoice.status = 'failed'
+            elif invoice.status != 'paid':
+                BillingService.mark_invoice_paid(invoice, obj.get('payment_intent'), commit=False)
+            return invoice
+
+        if event_type in SUBSCRIPTION_EVENTS:
+            subscription = subscriptions.get(obj.get('id'))
+            if subscription is None:
+                return None
+            # Read everything before assigning, so a malformed event changes nothing
+            changes = {
+                'status': 'canceled' if event_type == 'customer.subscription.deleted' else obj.get('status'),
+                'current_period_start': _timestamp(obj.get('current_period_start')),
+                'current_period_end': _timestamp(obj.get('current_period_end')),
+            }
+            if 'cancel_at_period_end' in obj:
+                changes['cancel_at_period_end'] = bool(obj['cancel_at_period_end'])
+            for column, value in changes.items():
+                if value is not None:
+                    setattr(subscription, column, value)
+            return subscription
+
+        return None
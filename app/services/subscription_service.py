@@ -1,15 +1,100 @@
+import time
 from datetime import datetime, timedelta
+from flask import current_app, g, has_request_context
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models import db, Subscription, SubscriptionPlan, UsageCharge, Company
 
+CACHE_PREFIX = 'subscription:'
+
+def _cache():
+    from app import cache
+    return cache
+
+def _columns(obj):
+    return {attr.key: getattr(obj, attr.key) for attr in db.inspect(type(obj)).column_attrs}
+
+def _attach(model, columns):
+    """Put a cached row into the session as a clean persistent object, without a query"""
+    obj = model(**columns)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
 class SubscriptionService:
     """Handles subscription management and plan enforcement"""
     
     @staticmethod
     def get_active_subscription(user):
-        """Get user's active subscription"""
-        if user.subscription_id:
-            return Subscription.query.get(user.subscription_id)
-        return None
+        """
+        Get user's active subscription, with its plan already loaded.
+
+        Resolved once per request (kept on flask.g) and cached across
+        requests for SUBSCRIPTION_CACHE_TIMEOUT seconds, so the decorator,
+        the view and the usage helpers share one lookup. The cross-request
+        entry is dropped by create/upgrade/cancel.
+        """
+        if not user.subscription_id:
+            return None
+        subscription_id = user.subscription_id
+
+        resolved = g.setdefault('subscriptions', {}) if has_request_context() else {}
+        if subscription_id in resolved:
+            return resolved[subscription_id]
+
+        subscription = SubscriptionService._load_cached(subscription_id)
+        if subscription is None:
+            subscription = Subscription.query.options(
+                db.joinedload(Subscription.plan)
+            ).filter_by(id=subscription_id).first()
+            if subscription is not None:
+                SubscriptionService._store_cached(subscription)
+
+        resolved[subscription_id] = subscription
+        return subscription
+
+    @staticmethod
+    def _load_cached(subscription_id):
+        timeout = current_app.config.get('SUBSCRIPTION_CACHE_TIMEOUT', 60)
+        if not timeout:
+            return None
+        try:
+            entry = _cache().get(CACHE_PREFIX + str(subscription_id))
+        except Exception as e:
+            print(f"Subscription cache error: {e}")
+            return None
+        if not entry:
+            return None
+        subscription = _attach(Subscription, entry['subscription'])
+        # Loaded state, not a change: nothing to flush
+        set_committed_value(subscription, 'plan', _attach(SubscriptionPlan, entry['plan']))
+        return subscription
+
+    @staticmethod
+    def _store_cached(subscription):
+        timeout = current_app.config.get('SUBSCRIPTION_CACHE_TIMEOUT', 60)
+        if not timeout:
+            return
+        try:
+            _cache().set(CACHE_PREFIX + str(subscription.id), {
+                'subscription': _columns(subscription),
+                'plan': _columns(subscription.plan)
+            }, timeout=timeout)
+        except Exception as e:
+            print(f"Subscription cache error: {e}")
+
+    @staticmethod
+    def invalidate(*subscription_ids):
+        """Drop cached copies of subscriptions after they change"""
+        if not subscription_ids:
+            return
+        if has_request_context():
+            resolved = g.setdefault('subscriptions', {})
+            for subscription_id in subscription_ids:
+                resolved.pop(subscription_id, None)
+        try:
+            _cache().delete_many(*[CACHE_PREFIX + str(i) for i in subscription_ids])
+        except Exception as e:
+            print(f"Subscription cache error: {e}")
     
     @staticmethod
     def create_subscription(user, plan_id, stripe_subscription_id=None, stripe_customer_id=None):
@@ -32,6 +117,7 @@ class SubscriptionService:
         # Link user to subscription
         user.subscription_id = subscription.id
         db.session.commit()
+        SubscriptionService.invalidate(subscription.id)
         
         return subscription
     
@@ -43,39 +129,34 @@ class SubscriptionService:
             
         plan = subscription.plan
         
-        # Count active companies under this subscription
-        active_companies = Company.query.join(
-            'practitioner'
-        ).filter(
-            Company.is_active == True,
-            db.text('user.subscription_id = :sub_id')
-        ).params(sub_id=subscription.id).count()
-        
         if plan.companies_included == -1:  # Unlimited (Enterprise)
             return True, None
             
-        if active_companies < plan.companies_included:
+        if SubscriptionService.get_company_count(subscription) < plan.companies_included:
             return True, None
             
         # They can still add, but will be charged
         return True, f"Additional company will cost ₹{plan.extra_company_cost}"
     
     @staticmethod
-    def get_company_count(subscription):
-        """Get number of active companies for a subscription"""
+    def company_count_query(subscription_id):
+        """COUNT of active companies owned by the subscription's users, as one join"""
         from app.models import User
-        
-        # Get all practitioners with this subscription
-        users = User.query.filter_by(subscription_id=subscription.id).all()
-        user_ids = [u.id for u in users]
-        
-        # Count their active companies
-        count = Company.query.filter(
-            Company.practitioner_id.in_(user_ids),
+        return db.select(db.func.count(Company.id)).join(
+            User, User.id == Company.practitioner_id
+        ).where(
+            User.subscription_id == subscription_id,
             Company.is_active == True
-        ).count()
-        
-        return count
+        )
+    
+    @staticmethod
+    def get_company_count(subscription):
+        """Get number of active companies for a subscription"""
+        # ix_user_subscription_id finds the users, ix_company_practitioner_active
+        # their active companies
+        return db.session.execute(
+            SubscriptionService.company_count_query(subscription.id)
+        ).scalar()
     
     @staticmethod
     def upgrade_plan(subscription, new_plan_id):
@@ -83,6 +164,7 @@ class SubscriptionService:
         subscription.plan_id = new_plan_id
         subscription.updated_at = datetime.utcnow()
         db.session.commit()
+        SubscriptionService.invalidate(subscription.id)
         return subscription
     
     @staticmethod
@@ -95,4 +177,148 @@ class SubscriptionService:
             subscription.cancel_at_period_end = True
         
         db.session.commit()
+        SubscriptionService.invalidate(subscription.id)
         return subscription
+    
+    @staticmethod
+    def _active_deltas(rows, sign):
+        """Metric deltas for subscriptions entering (+1) or leaving (-1) 'active'"""
+        deltas = {'active_subscriptions': sign * len(rows)}
+        for row in rows:
+            key = f"plan:{row.plan_id}"
+            deltas[key] = deltas.get(key, 0) + sign
+        return deltas
+    
+    @staticmethod
+    def _sweep_status(condition, new_status, now, batch_size):
+        """
+        Move subscriptions matching ``condition`` to ``new_status`` in
+        batches. Rows are picked with FOR UPDATE SKIP LOCKED so concurrent
+        sweeps split the work; each batch commits on its own.
+        Returns the ids that changed.
+        """
+        from app.services.metrics_service import MetricsService
+        changed = []
+        while True:
+            rows = db.session.execute(
+                db.select(Subscription.id, Subscription.plan_id, Subscription.status).where(
+                    condition
+                ).order_by(Subscription.id).limit(batch_size).with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            db.session.execute(
+                db.update(Subscription).where(
+                    Subscription.id.in_(ids), condition
+                ).values(
+                    status=new_status,
+                    updated_at=now
+                ).execution_options(synchronize_session=False)
+            )
+            # Bulk UPDATE skips the ORM listeners that keep metrics current
+            leaving = [row for row in rows if row.status == 'active']
+            if new_status == 'active':
+                MetricsService.increment(SubscriptionService._active_deltas(rows, 1))
+            elif leaving:
+                MetricsService.increment(SubscriptionService._active_deltas(leaving, -1))
+            db.session.commit()
+            SubscriptionService.invalidate(*ids)
+            changed.extend(ids)
+            if len(rows) < batch_size:
+                break
+        return changed
+    
+    @staticmethod
+    def sweep_lifecycle(now=None, batch_size=1000):
+        """
+        Act on stored subscription dates so request paths only read status:
+        
+        1. cancel subscriptions flagged cancel_at_period_end whose period
+           has ended;
+        2. mark active subscriptions past_due when an invoice is still
+           unpaid SUBSCRIPTION_GRACE_DAYS after its due date, and
+           reactivate past_due ones once nothing is overdue (subscriptions
+           billed through Stripe get their status from its webhooks);
+        3. roll ended periods forward for subscriptions with nothing to
+           bill (the billing cycle run advances the ones it invoices).
+        
+        Every step is driven by an index range scan ((status,
+        current_period_end) on subscription, (status, due_date) on
+        invoice) and works in committed batches.
+        """
+        from app.models import Invoice
+        from app.services.billing_service import BILLING_CYCLE_DAYS
+        
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        grace = current_app.config.get('SUBSCRIPTION_GRACE_DAYS', 7)
+        timings = {}
+        
+        step = time.perf_counter()
+        canceled = SubscriptionService._sweep_status(db.and_(
+            Subscription.status.in_(('active', 'trialing', 'past_due')),
+            Subscription.current_period_end <= now,
+            Subscription.cancel_at_period_end == True
+        ), 'canceled', now, batch_size)
+        timings['cancel_ms'] = round((time.perf_counter() - step) * 1000, 2)
+        
+        step = time.perf_counter()
+        overdue = db.select(Invoice.subscription_id).where(
+            Invoice.status.in_(('pending', 'failed')),
+            Invoice.due_date < now - timedelta(days=grace)
+        )
+        # Stripe owns the status of its subscriptions (webhook events set
+        # past_due and active), so the sweep leaves them alone both ways
+        local = Subscription.stripe_subscription_id == None
+        past_due = SubscriptionService._sweep_status(db.and_(
+            Subscription.status == 'active',
+            local,
+            Subscription.id.in_(overdue)
+        ), 'past_due', now, batch_size)
+        reactivated = SubscriptionService._sweep_status(db.and_(
+            Subscription.status == 'past_due',
+            local,
+            Subscription.id.not_in(overdue)
+        ), 'active', now, batch_size)
+        timings['past_due_ms'] = round((time.perf_counter() - step) * 1000, 2)
+        
+        step = time.perf_counter()
+        cycle = timedelta(days=BILLING_CYCLE_DAYS)
+        rolled = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(Subscription.id, Subscription.current_period_end).where(
+                    Subscription.id > last_id,
+                    Subscription.status.in_(('active', 'trialing', 'past_due')),
+                    Subscription.current_period_end <= now,
+                    Subscription.cancel_at_period_end.is_not(True),
+                    db.or_(Subscription.next_billing_date == None, Subscription.next_billing_date > now)
+                ).order_by(Subscription.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            updates = []
+            for row in rows:
+                start, end = row.current_period_end, row.current_period_end + cycle
+                while end <= now:
+                    start, end = end, end + cycle
+                updates.append({'id': row.id, 'current_period_start': start,
+                                'current_period_end': end, 'updated_at': now})
+            db.session.execute(db.update(Subscription), updates)
+            db.session.commit()
+            SubscriptionService.invalidate(*[row.id for row in rows])
+            rolled += len(rows)
+        timings['rollover_ms'] = round((time.perf_counter() - step) * 1000, 2)
+        
+        return {
+            'canceled': len(canceled),
+            'past_due': len(past_due),
+            'reactivated': len(reactivated),
+            'rolled_over': rolled,
+            'as_of': now.isoformat(),
+            'timings': timings,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
@@ -0,0 +1,151 @@
+from datetime import datetime
+from sqlalchemy import event
+from app.models import db, User, Company, UsageCharge, Subscription, SubscriptionUsage
+from app.services.subscription_service import SubscriptionService
+
+# Columns whose changes move a subscription's usage, per model
+TRACKED = {
+    Company: ('practitioner_id', 'is_active'),
+    UsageCharge: ('subscription_id', 'invoiced', 'amount'),
+    User: ('subscription_id',),
+}
+
+class UsageService:
+    """
+    Materialized billing usage, one subscription_usage row per subscription.
+
+    Rows are recomputed for just the affected subscriptions whenever
+    companies, charges or user subscriptions change: ORM writes are picked
+    up by session listeners (see register_usage_listeners), set-based paths
+    call refresh with the subscription ids they touched. The recount is
+    one UPDATE with correlated subqueries over indexed columns, run in the
+    writer's transaction, so the row never drifts from its sources.
+    """
+
+    @staticmethod
+    def _recount(subscription_id):
+        """Correlated subqueries that recount one subscription's usage"""
+        pending = db.and_(
+            UsageCharge.subscription_id == subscription_id,
+            UsageCharge.invoiced == False
+        )
+        return {
+            'company_count': SubscriptionService.company_count_query(subscription_id).scalar_subquery(),
+            'pending_charge_count': db.select(db.func.count(UsageCharge.id)).where(pending).scalar_subquery(),
+            'pending_amount': db.select(db.func.coalesce(db.func.sum(UsageCharge.amount), 0)).where(pending).scalar_subquery(),
+        }
+
+    @staticmethod
+    def refresh(subscription_ids=None, practitioner_ids=None, connection=None):
+        """
+        Recount usage for the given subscriptions and for the subscriptions
+        of the given practitioners; everything when both are None.
+        Runs in the caller's transaction.
+        """
+        execute = connection.execute if connection is not None else db.session.execute
+        if subscription_ids is None and practitioner_ids is None:
+            target = db.true()
+        else:
+            conditions = []
+            if subscription_ids:
+                conditions.append(Subscription.id.in_(list(subscription_ids)))
+            if practitioner_ids:
+                conditions.append(Subscription.id.in_(
+                    db.select(User.subscription_id).where(User.id.in_(list(practitioner_ids)))
+                ))
+            if not conditions:
+                return
+            target = db.or_(*conditions)
+
+        # Subscriptions without a row yet start from zero and are recounted below
+        execute(db.insert(SubscriptionUsage).from_select(
+            ['subscription_id', 'company_count', 'pending_charge_count', 'pending_amount'],
+            db.select(Subscription.id, db.literal(0), db.literal(0), db.literal(0.0)).where(
+                target,
+                ~db.exists().where(SubscriptionUsage.subscription_id == Subscription.id)
+            )
+        ))
+        execute(db.update(SubscriptionUsage).where(
+            SubscriptionUsage.subscription_id.in_(db.select(Subscription.id).where(target))
+        ).values(
+            updated_at=datetime.utcnow(),
+            **UsageService._recount(SubscriptionUsage.subscription_id)
+        ).execution_options(synchronize_session=False))
+
+    @staticmethod
+    def get_usage(subscription):
+        """
+        Usage summary for the billing and practitioner dashboards from one
+        primary-key read. Individual charges are not loaded here; see
+        BillingService.get_pending_charges.
+        """
+        row = db.session.get(SubscriptionUsage, subscription.id)
+        if row is None:
+            # Rows come from the migration's backfill and from new
+            # subscriptions' flushes; fill a gap in the caller's transaction
+            # without committing whatever else it has pending
+            UsageService.refresh([subscription.id])
+            row = db.session.get(SubscriptionUsage, subscription.id)
+
+        included = subscription.plan.companies_included
+        return {
+            'company_count': row.company_count,
+            'companies_included': included,
+            'extra_companies': max(0, row.company_count - included) if included != -1 else 0,
+            'pending_charge_count': row.pending_charge_count,
+            'pending_amount': row.pending_amount,
+            'updated_at': row.updated_at
+        }
+
+def _ids(obj, column, new):
+    """Current and (unless new) previous value of an id column"""
+    history = db.inspect(obj).attrs[column].history
+    ids = list(history.added or history.unchanged)
+    if not new:
+        ids.extend(history.deleted)
+    return ids
+
+def _before_flush(session, flush_context, instances):
+    subscription_ids = session.info.setdefault('usage_subscriptions', set())
+    practitioner_ids = session.info.setdefault('usage_practitioners', set())
+    for collection, new in ((session.new, True), (session.dirty, False), (session.deleted, False)):
+        for obj in collection:
+            columns = TRACKED.get(type(obj))
+            if columns is None:
+                continue
+            if collection is session.dirty and not any(
+                db.inspect(obj).attrs[column].history.has_changes() for column in columns
+            ):
+                continue
+            if isinstance(obj, Company):
+                practitioner_ids.update(_ids(obj, 'practitioner_id', new))
+            else:
+                subscription_ids.update(_ids(obj, 'subscription_id', new))
+
+def _after_flush(session, flush_context):
+    subscription_ids = session.info.pop('usage_subscriptions', set()) - {None}
+    practitioner_ids = session.info.pop('usage_practitioners', set()) - {None}
+    # New subscriptions get their (empty) row in the same transaction
+    subscription_ids.update(obj.id for obj in session.new if isinstance(obj, Subscription))
+    if subscription_ids or practitioner_ids:
+        UsageService.refresh(subscription_ids, practitioner_ids, connection=session.connection())
+
+def _discard(session, previous_transaction):
+    session.info.pop('usage_subscriptions', None)
+    session.info.pop('usage_practitioners', None)
+
+def _load_old_value(target, value, oldvalue, initiator):
+    # active_history: the old id is needed to recount the subscription it left
+    return value
+
+def register_usage_listeners():
+    """Keep subscription_usage in step with ORM writes (idempotent)"""
+    for model, columns in TRACKED.items():
+        for column in columns:
+            attribute = getattr(model, column)
+            if not event.contains(attribute, 'set', _load_old_value):
+                event.listen(attribute, 'set', _load_old_value, active_history=True, retval=True)
+    for name, fn in (('before_flush', _before_flush), ('after_flush', _after_flush),
+                     ('after_soft_rollback', _discard)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
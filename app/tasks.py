@@ -1,10 +1,18 @@
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_process_shutdown, worker_shutdown
 from flask import current_app
+from app.utils.audit import shutdown_audit_writer
 import datetime
 
 # Don't create app at module level to avoid circular imports
 celery = Celery('compliancepro360')
 
+# Write queued audit rows before a worker (or prefork child) exits;
+# prefork children leave via os._exit, which skips atexit handlers
+worker_process_shutdown.connect(shutdown_audit_writer, weak=False)
+worker_shutdown.connect(shutdown_audit_writer, weak=False)
+
 # Config will be set when flask app initializes
 @celery.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
@@ -14,6 +22,42 @@ def setup_periodic_tasks(sender, **kwargs):
         check_regulatory_updates.s(),
         name='check-regulatory-updates-daily'
     )
+    # Flip passed due dates to Overdue shortly after midnight
+    sender.add_periodic_task(
+        crontab(hour=0, minute=15),
+        mark_overdue_compliances.s(),
+        name='mark-overdue-compliances-daily'
+    )
+    # Create upcoming audit_log partitions and archive expired months
+    sender.add_periodic_task(
+        crontab(hour=1, minute=0),
+        maintain_audit_log.s(),
+        name='maintain-audit-log-daily'
+    )
+    # Invoice subscriptions whose billing date has passed
+    sender.add_periodic_task(
+        crontab(hour=2, minute=0),
+        run_billing_cycle.s(),
+        name='run-billing-cycle-daily'
+    )
+    # Cancel, mark past_due and roll over subscriptions from their stored dates
+    sender.add_periodic_task(
+        crontab(minute=30),
+        sweep_subscription_lifecycle.s(),
+        name='sweep-subscription-lifecycle-hourly'
+    )
+    # Recount the admin metrics snapshot (write paths keep it current in between)
+    sender.add_periodic_task(
+        crontab(minute='*/15'),
+        refresh_metrics_snapshot.s(),
+        name='refresh-metrics-snapshot'
+    )
+    # Apply queued Stripe webhook events
+    sender.add_periodic_task(
+        5.0,
+        process_stripe_events.s(),
+        name='process-stripe-events'
+    )
 
 @celery.task
 def check_regulatory_updates():
@@ -22,7 +66,9 @@ def check_regulatory_updates():
     Uses Flask app context from current_app instead of global flask_app.
     """
     from app.models import db, ComplianceMaster, ComplianceOverride
-    from app.llm_engine import process_compliance_update
+    from app.llm_engine import process_compliance_updates
+    from app.services.calendar_service import CalendarService
+    from app.utils.llm_cache import get_extraction_cache
     
     # Mock regulatory text - in real app, this would be scraped
     mock_updates = [
@@ -31,33 +77,117 @@ def check_regulatory_updates():
     ]
     
     results = []
-    for text in mock_updates:
-        # Skip actual LLM call if keys are missing to prevent crash in dev
-        if not current_app.config.get('OPENAI_API_KEY'):
-            print("Skipping LLM: No API Key")
-            continue
-            
-        data = process_compliance_update(text)
-        if data:
-            # Update DB logic
-            compliance_name = data.get('Compliance Name')
-            # Find matching compliance in Master
-            compliance = ComplianceMaster.query.filter(
-                ComplianceMaster.name.ilike(f"%{compliance_name}%")
-            ).first()
+    # Skip actual LLM call if keys are missing to prevent crash in dev
+    if not current_app.config.get('OPENAI_API_KEY'):
+        print("Skipping LLM: No API Key")
+        return {'updates': results, 'cache': None}
+    
+    # Run the dual-LLM pipeline over all texts concurrently
+    extractions = process_compliance_updates(mock_updates)
+    
+    for text_extractions in extractions:
+        for data in text_extractions:
+            if data:
+                # Update DB logic
+                compliance_name = data.get('Compliance Name')
+                # Find matching compliance in Master
+                compliance = ComplianceMaster.query.filter(
+                    ComplianceMaster.name.ilike(f"%{compliance_name}%")
+                ).first()
             
-            if compliance:
-                new_date = datetime.datetime.strptime(data['New Due Date'], '%Y-%m-%d').date()
-                override = ComplianceOverride(
-                    compliance_id=compliance.id,
-                    year=datetime.datetime.now().year,
-                    new_due_date=new_date,
-                    reason="AI Detected Update",
-                    is_permanent=data.get('Is this a permanent change?', False)
-                )
-                db.session.add(override)
-                results.append(f"Updated {compliance.name}")
+                if compliance:
+                    new_date = datetime.datetime.strptime(data['New Due Date'], '%Y-%m-%d').date()
+                    override = ComplianceOverride(
+                        compliance_id=compliance.id,
+                        year=datetime.datetime.now().year,
+                        new_due_date=new_date,
+                        reason="AI Detected Update",
+                        is_permanent=data.get('Is this a permanent change?', False)
+                    )
+                    db.session.add(override)
+                    db.session.flush()
+                
+                    # Move only the open records this override affects
+                    diff = CalendarService.propagate_override(override)
+                    results.append(f"Updated {compliance.name} ({diff['updated']} records)")
     
     db.session.commit()
-    return results
+    
+    cache = get_extraction_cache()
+    return {'updates': results, 'cache': cache.stats() if cache else None}
+
+
+@celery.task
+def generate_compliance_calendar(financial_year=None):
+    """
+    Expand ComplianceMaster rules into ComplianceRecord rows for every
+    active company. Defaults to the current financial year (April-March).
+    Safe to re-run: existing (company, compliance, period) rows are skipped.
+    """
+    from app.services.calendar_service import CalendarService, format_financial_year
+    
+    if financial_year is None:
+        today = datetime.date.today()
+        financial_year = format_financial_year(today.year if today.month >= 4 else today.year - 1)
+    
+    return CalendarService.generate_calendar(financial_year)
+
+@celery.task
+def mark_overdue_compliances(batch_size=5000):
+    """
+    Set-based sweep of Pending records past their due date to Overdue.
+    Returns the number of rows changed and how long the sweep took.
+    """
+    from app.services.calendar_service import CalendarService
+    
+    return CalendarService.mark_overdue(batch_size=batch_size)
+
+@celery.task
+def maintain_audit_log():
+    """
+    Keep audit_log partitioned by month: create the next partitions
+    (Postgres) or roll finished months into their own tables (other
+    databases), then export and drop months past AUDIT_RETENTION_MONTHS.
+    """
+    from app.services.audit_service import AuditService
+    
+    return AuditService.maintain()
+
+
+@celery.task
+def refresh_metrics_snapshot():
+    """Recount the materialized admin metrics"""
+    from app.services.metrics_service import MetricsService
+    
+    return MetricsService.refresh()
+
+@celery.task
+def run_billing_cycle(chunk_size=500):
+    """
+    Invoice every subscription due for billing in chunked transactions.
+    Safe to re-run after a crash: finished chunks have already moved their
+    subscriptions to the next period.
+    """
+    from app.services.billing_service import BillingService
+    
+    return BillingService.run_billing_cycle(chunk_size=chunk_size)
 
+@celery.task
+def process_stripe_events(batch_size=None):
+    """
+    Drain the Stripe webhook queue in batches. Runs every few seconds;
+    overlapping runs return immediately while another one holds the lock.
+    """
+    from app.services.stripe_webhook_service import StripeWebhookService
+    
+    return StripeWebhookService.drain(batch_size=batch_size)
+
+@celery.task
+def sweep_subscription_lifecycle(batch_size=1000):
+    """
+    Apply period ends, cancellations and past-due status in set-based
+    batches, so subscription checks on requests stay a status read.
+    """
+    from app.services.subscription_service import SubscriptionService
+    
+    return SubscriptionService.sweep_lifecycle(batch_size=batch_size)
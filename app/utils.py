@@ -1,20 +1,8 @@
-import re
 import jwt
 import datetime
 from flask import current_app
 
-def validate_pan(pan):
-    pattern = r"[A-Z]{5}[0-9]{4}[A-Z]{1}"
-    return bool(re.match(pattern, pan))
-
-def validate_gstin(gstin):
-    pattern = r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}"
-    return bool(re.match(pattern, gstin))
-
-def extract_pan_from_gstin(gstin):
-    if validate_gstin(gstin):
-        return gstin[2:12]
-    return None
+# Identifier validators live in app/utils/validators.py
 
 def generate_share_token(company_id, expires_in=3600*24*30): # 30 days default
     payload = {
@@ -1,10 +1,10 @@
 # Utils package initialization
-from .validators import validate_pan, validate_gstin, extract_pan_from_gstin
+from .validators import validate_pan, validate_gstin, extract_pan_from_gstin, validate_cin, validate_many
 from .tokens import generate_share_token, verify_share_token
 from .decorators import role_required, log_audit, admin_required
 
 __all__ = [
-    'validate_pan', 'validate_gstin', 'extract_pan_from_gstin',
+    'validate_pan', 'validate_gstin', 'extract_pan_from_gstin', 'validate_cin', 'validate_many',
     'generate_share_token', 'verify_share_token',
     'role_required', 'log_audit', 'admin_required'
 ]
@@ -0,0 +1,154 @@
+# Response cache and conditional GET for api/v1
+#
+# Cached responses are keyed by user scope, request path/query and a set of
+# version counters. Writes to Company / ComplianceRecord / User bump the
+# counters after commit, so stale entries are never read again and simply
+# expire. The ETag is derived from the same key, which lets a matching
+# If-None-Match be answered with 304 before the view or any query runs.
+
+import time
+import hashlib
+from functools import wraps
+from flask import current_app, request, make_response
+from flask_login import current_user
+from sqlalchemy import event
+from app.models import db, Company, ComplianceRecord, User
+
+VERSION_PREFIX = 'api_version:'
+RESPONSE_PREFIX = 'api_response:'
+
+def _cache():
+    from app import cache
+    return cache
+
+def _seed():
+    # Missing counters start from the clock, so a counter that was evicted
+    # never comes back with a value an old cached response was keyed on
+    return int(time.time() * 1000)
+
+def get_versions(namespaces):
+    """Current counter for each namespace, creating missing ones"""
+    cache = _cache()
+    keys = [VERSION_PREFIX + ns for ns in namespaces]
+    values = cache.get_many(*keys)
+    for i, value in enumerate(values):
+        if value is None:
+            cache.add(keys[i], _seed())
+            values[i] = cache.get(keys[i])
+    return values
+
+def bump_versions(namespaces):
+    """Invalidate every cached response that depends on these namespaces"""
+    cache = _cache()
+    for ns in set(namespaces):
+        key = VERSION_PREFIX + ns
+        try:
+            if not cache.add(key, _seed()):
+                cache.cache.inc(key)
+        except Exception as e:
+            print(f"API cache error: {e}")
+
+def mark_changed(session, *namespaces):
+    """Queue namespaces to bump when the session commits"""
+    session.info.setdefault('api_cache_bump', set()).update(namespaces)
+
+def _namespaces_for(obj):
+    if isinstance(obj, Company):
+        return ('companies', f'company:{obj.id}', 'stats')
+    if isinstance(obj, ComplianceRecord):
+        return (f'company:{obj.company_id}', 'stats')
+    return ()
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        namespaces = _namespaces_for(obj)
+        if namespaces:
+            mark_changed(session, *namespaces)
+    if any(isinstance(obj, User) for obj in list(session.new) + list(session.deleted)):
+        mark_changed(session, 'stats')
+
+def _do_orm_execute(state):
+    # Set-based UPDATE/DELETE/INSERT (calendar generation, propagation,
+    # overdue sweep) touch any number of companies at once
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    # ORM statements carry an annotated copy of the table; compare names
+    table = getattr(getattr(state.statement, 'table', None), 'name', None)
+    if table == ComplianceRecord.__tablename__:
+        mark_changed(state.session, 'records', 'stats')
+    elif table == Company.__tablename__:
+        mark_changed(state.session, 'companies', 'records', 'stats')
+
+def _after_commit(session):
+    namespaces = session.info.pop('api_cache_bump', None)
+    if namespaces:
+        bump_versions(namespaces)
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('api_cache_bump', None)
+
+def register_version_listeners():
+    """Hook version bumps into the Flask-SQLAlchemy session (idempotent)"""
+    for name, fn in (('after_flush', _after_flush), ('do_orm_execute', _do_orm_execute),
+                     ('after_commit', _after_commit), ('after_soft_rollback', _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+def _user_scope():
+    # Everything the views' access checks read, so that moving a user to
+    # another company (or deactivating them) starts a new scope
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return (f"{current_user.role}:{current_user.id}:"
+            f"{current_user.company_id}:{int(bool(current_user.is_active))}")
+
+def cached_api(*namespaces, timeout=None):
+    """
+    Cache a JSON view per user scope and answer conditional GETs.
+
+    ``namespaces`` are version counter names formatted with the view's
+    kwargs, e.g. ``cached_api('company:{company_id}', 'records')``.
+    Only 200 responses are cached. Access checks inside the view still run
+    on a miss; an entry for a scope only exists if that scope passed them,
+    and company changes bump the counters that entry depends on.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('API_CACHE_ENABLED', True):
+                return f(*args, **kwargs)
+
+            try:
+                names = [ns.format(**kwargs) for ns in namespaces]
+                versions = get_versions(names)
+                cache = _cache()
+            except Exception as e:
+                print(f"API cache error: {e}")
+                return f(*args, **kwargs)
+
+            raw = '|'.join([_user_scope(), request.full_path] +
+                           [f"{n}={v}" for n, v in zip(names, versions)])
+            digest = hashlib.sha256(raw.encode()).hexdigest()
+
+            if request.if_none_match.contains(digest):
+                response = make_response('', 304)
+            else:
+                key = RESPONSE_PREFIX + digest
+                entry = cache.get(key)
+                if entry is None:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    cache.set(key, (response.get_data(), response.mimetype),
+                              timeout=timeout or current_app.config.get('API_CACHE_TIMEOUT', 300))
+                else:
+                    body, mimetype = entry
+                    response = current_app.response_class(body, 200, mimetype=mimetype)
+
+            response.set_etag(digest)
+            # Clients must revalidate, which is a cheap 304 while nothing changed
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
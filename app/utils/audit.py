@@ -0,0 +1,154 @@
+# Background audit-log writer
+# Requests enqueue audit rows in memory; a daemon thread writes them in
+# batches with multi-row INSERTs on its own connection, so logging never
+# touches (or rolls back) the caller's session.
+
+import os
+import time
+import queue
+import atexit
+import threading
+from flask import current_app
+from app.models import db, AuditLog
+
+class AuditWriter:
+    """
+    Bounded in-process queue of audit rows flushed in batches.
+
+    When the queue is full the producer flushes a batch itself
+    (backpressure) instead of dropping events or growing memory.
+    """
+
+    def __init__(self, app, max_size=10000, batch_size=200, flush_interval=1.0):
+        self.app = app
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive fork (gunicorn --preload, Celery prefork);
+        # start a fresh queue and thread in each process on first use
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, row):
+        """Queue one audit row (a dict of AuditLog column values)"""
+        self._ensure_started()
+        while True:
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                self.flush()
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self, limit=None):
+        """Write up to ``limit`` queued rows (default: one batch)"""
+        if self._pid != os.getpid():
+            return 0
+        with self._flush_lock:
+            return self._write(self._drain(limit or self.batch_size))
+
+    def _write(self, rows):
+        if not rows:
+            return 0
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(db.insert(AuditLog), rows)
+            self.written += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            print(f"Audit log error: {e}")
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rows = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Gather a batch: wait at most flush_interval after the first row
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._flush_lock:
+                self._write(rows)
+
+    def close(self, timeout=5.0):
+        """Stop the thread and write everything still queued"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        while self.flush():
+            pass
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'written': self.written,
+            'failed': self.failed
+        }
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_audit_writer():
+    """Return the process-wide audit writer, or None when AUDIT_ASYNC is off"""
+    global _writer
+    if not current_app.config.get('AUDIT_ASYNC', True):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = current_app.config
+                _writer = AuditWriter(
+                    current_app._get_current_object(),
+                    max_size=config.get('AUDIT_QUEUE_SIZE', 10000),
+                    batch_size=config.get('AUDIT_BATCH_SIZE', 200),
+                    flush_interval=config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+def shutdown_audit_writer(**kwargs):
+    """Flush pending audit rows; connected to worker shutdown signals"""
+    if _writer is not None:
+        _writer.close()
+
+def write_audit(row):
+    """Queue an audit row, or insert it directly when the writer is disabled"""
+    writer = get_audit_writer()
+    if writer is not None:
+        writer.submit(row)
+        return
+    with db.engine.begin() as conn:
+        conn.execute(db.insert(AuditLog), [row])
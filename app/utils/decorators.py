@@ -1,7 +1,8 @@
 from functools import wraps
 from flask import abort, request
 from flask_login import current_user
-from app.models import db, AuditLog
+from datetime import datetime
+from app.utils.audit import write_audit
 
 def role_required(*roles):
     """Decorator to require specific role(s)"""
@@ -47,18 +48,16 @@ def subscription_required(f):
     return decorated_function
 
 def log_audit(action, details=None):
-    """Log an audit event"""
+    """Log an audit event (queued; written in batches off the request path)"""
     try:
         if current_user.is_authenticated:
-            log = AuditLog(
-                user_id=current_user.id,
-                action=action,
-                details=details[:255] if details else None,
-                ip_address=request.remote_addr if request else None
-            )
-            db.session.add(log)
-            db.session.commit()
+            write_audit({
+                'user_id': current_user.id,
+                'action': action,
+                'details': details[:255] if details else None,
+                'ip_address': request.remote_addr if request else None,
+                'timestamp': datetime.utcnow()
+            })
     except Exception as e:
         # Don't fail the request if logging fails
         print(f"Audit log error: {e}")
-        db.session.rollback()
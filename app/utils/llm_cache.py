@@ -0,0 +1,149 @@
+# Content-addressed cache for LLM extraction results
+# Identical regulatory text + prompt version + models skips the LLM pipeline
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+def make_cache_key(text, prompt_version, models):
+    """
+    Build a cache key from the normalized text, prompt version and model names.
+    Whitespace and case differences in the source text map to the same key.
+    """
+    normalized = ' '.join(text.split()).lower()
+    digest = hashlib.sha256()
+    digest.update(prompt_version.encode('utf-8'))
+    for model in models:
+        digest.update(b'\x00' + model.encode('utf-8'))
+    digest.update(b'\x00' + normalized.encode('utf-8'))
+    return f"llm_extract:{digest.hexdigest()}"
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and a max entry count"""
+
+    def __init__(self, max_entries=1024, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry[2]
+            return entry[1]
+
+    def set(self, key, value, cost_ms=0.0):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, cost_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'saved_ms': round(self.saved_ms, 2)
+            }
+
+class RedisCache:
+    """
+    Redis-backed cache shared by all web and Celery workers.
+    Entries expire after ``ttl``; size-based eviction is left to the
+    server's maxmemory policy (allkeys-lru recommended). Hit/miss counters
+    live in Redis so they aggregate across processes.
+    """
+
+    STATS_KEY = 'llm_extract:stats'
+
+    def __init__(self, url, ttl=86400):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        # A cache outage must never block the pipeline: treat errors as misses
+        try:
+            raw = self.client.get(key)
+            if raw is None:
+                self.client.hincrby(self.STATS_KEY, 'misses', 1)
+                return None
+            entry = json.loads(raw)
+            pipe = self.client.pipeline()
+            pipe.hincrby(self.STATS_KEY, 'hits', 1)
+            pipe.hincrbyfloat(self.STATS_KEY, 'saved_ms', entry.get('cost_ms', 0))
+            pipe.execute()
+            return entry['value']
+        except Exception as e:
+            print(f"LLM cache error: {e}")
+            return None
+
+    def set(self, key, value, cost_ms=0.0):
+        try:
+            self.client.setex(key, self.ttl, json.dumps({'value': value, 'cost_ms': cost_ms}))
+        except Exception as e:
+            print(f"LLM cache error: {e}")
+
+    def clear(self):
+        for key in self.client.scan_iter('llm_extract:*'):
+            self.client.delete(key)
+
+    def stats(self):
+        try:
+            raw = self.client.hgetall(self.STATS_KEY)
+        except Exception as e:
+            return {'backend': 'redis', 'error': str(e)}
+        values = {k.decode(): float(v) for k, v in raw.items()}
+        return {
+            'backend': 'redis',
+            'hits': int(values.get('hits', 0)),
+            'misses': int(values.get('misses', 0)),
+            'saved_ms': round(values.get('saved_ms', 0.0), 2)
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    """
+    Return the process-wide extraction cache configured by LLM_CACHE_BACKEND
+    ('redis', 'memory' or 'none'), or None when caching is disabled.
+    """
+    global _cache
+    backend = current_app.config.get('LLM_CACHE_BACKEND', 'memory')
+    if not backend or backend == 'none':
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = current_app.config.get('LLM_CACHE_TTL', 86400)
+                if backend == 'redis':
+                    _cache = RedisCache(current_app.config['CACHE_REDIS_URL'], ttl=ttl)
+                else:
+                    _cache = MemoryCache(
+                        max_entries=current_app.config.get('LLM_CACHE_MAX_ENTRIES', 1024),
+                        ttl=ttl
+                    )
+    return _cache
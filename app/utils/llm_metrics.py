@@ -0,0 +1,220 @@
+# Token accounting and per-call LLM usage metrics
+# Counts come from the providers' usage fields; the local tokenizer is used
+# for offline comparisons (TOON vs JSON) and when a response has no usage.
+
+import os
+import re
+import math
+import hashlib
+import threading
+from flask import current_app
+
+# USD per 1M tokens: (prompt, completion)
+MODEL_PRICING = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+}
+
+# tiktoken encodings per model. Claude has no public local tokenizer, so
+# cl100k_base stands in for it and its counts are reported as estimates.
+MODEL_ENCODINGS = {
+    'gpt-3.5-turbo': 'cl100k_base',
+    'claude-3-5-sonnet-20241022': 'cl100k_base',
+}
+
+# BPE file per encoding: (url, sha256). tiktoken caches it under sha1(url)
+# in TIKTOKEN_CACHE_DIR, and re-downloads a file whose hash does not match.
+ENCODING_FILES = {
+    'cl100k_base': ('https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken',
+                    '223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7'),
+}
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_encodings = {}
+
+def load_tokenizers(cache_dir):
+    """
+    Load the tiktoken encodings once, at startup, from a pre-fetched
+    TIKTOKEN_CACHE_DIR. An encoding whose file is missing or does not
+    match its pinned hash (or no directory, or no tiktoken) uses the
+    estimator instead, so tiktoken never downloads anything.
+    """
+    for name in set(MODEL_ENCODINGS.values()):
+        _encodings[name] = None
+        if not cache_dir or name not in ENCODING_FILES:
+            continue
+        url, expected = ENCODING_FILES[name]
+        path = os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest())
+        try:
+            with open(path, 'rb') as f:
+                found = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            found = None
+        if found != expected:
+            print(f"Tokenizer: no valid {name} file in {cache_dir}, using the estimator")
+            continue
+        try:
+            os.environ['TIKTOKEN_CACHE_DIR'] = cache_dir
+            import tiktoken
+            _encodings[name] = tiktoken.get_encoding(name)
+        except Exception as e:
+            print(f"Tokenizer error ({name}): {e}")
+
+def _get_encoding(name):
+    """Encoding loaded by load_tokenizers, or None for the estimator"""
+    return _encodings.get(name)
+
+def estimate_tokens(text):
+    """BPE-like estimate: one token per word piece, plus one per 4 extra chars"""
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _PIECES.findall(text))
+
+def count_tokens(text, model='gpt-3.5-turbo'):
+    """Count tokens for a model with a local tokenizer (no network calls)"""
+    encoding = _get_encoding(MODEL_ENCODINGS.get(model, 'cl100k_base'))
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+def tokenizer_name(model='gpt-3.5-turbo'):
+    encoding_name = MODEL_ENCODINGS.get(model, 'cl100k_base')
+    return encoding_name if _get_encoding(encoding_name) is not None else 'estimate'
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def usage_from_response(response, prompt=None, completion=None, model='gpt-3.5-turbo'):
+    """
+    Normalize provider usage to (prompt_tokens, completion_tokens, estimated).
+    OpenAI reports prompt/completion_tokens, Anthropic input/output_tokens;
+    without either, count the prompt and completion text locally.
+    """
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        if prompt_tokens is None:
+            prompt_tokens = getattr(usage, 'input_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        if completion_tokens is None:
+            completion_tokens = getattr(usage, 'output_tokens', None)
+        if prompt_tokens is not None and completion_tokens is not None:
+            return prompt_tokens, completion_tokens, False
+    return (count_tokens(prompt or '', model), count_tokens(completion or '', model), True)
+
+FIELDS = ('calls', 'errors', 'estimated', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'cost_usd')
+
+class MemoryMetrics:
+    """In-process usage totals per (operation, model)"""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, model, values):
+        with self._lock:
+            totals = self._totals.setdefault((operation, model), dict.fromkeys(FIELDS, 0))
+            for field, value in values.items():
+                totals[field] += value
+
+    def totals(self):
+        with self._lock:
+            return {key: dict(values) for key, values in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+class RedisMetrics:
+    """Usage totals in Redis hashes, aggregated across web and Celery workers"""
+
+    PREFIX = 'llm_metrics:'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def record(self, operation, model, values):
+        # Metrics must never break the pipeline
+        try:
+            key = f"{self.PREFIX}{operation}:{model}"
+            pipe = self.client.pipeline()
+            for field, value in values.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(key, field, value)
+                else:
+                    pipe.hincrby(key, field, value)
+            pipe.execute()
+        except Exception as e:
+            print(f"LLM metrics error: {e}")
+
+    def totals(self):
+        result = {}
+        for key in self.client.scan_iter(f"{self.PREFIX}*"):
+            operation, model = key.decode()[len(self.PREFIX):].split(':', 1)
+            raw = self.client.hgetall(key)
+            values = dict.fromkeys(FIELDS, 0)
+            for field, value in raw.items():
+                field = field.decode()
+                values[field] = float(value) if field in ('latency_ms', 'cost_usd') else int(value)
+            result[(operation, model)] = values
+        return result
+
+    def reset(self):
+        for key in self.client.scan_iter(f"{self.PREFIX}*"):
+            self.client.delete(key)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_llm_metrics():
+    """Return the process-wide metrics sink configured by LLM_METRICS_BACKEND"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                if current_app.config.get('LLM_METRICS_BACKEND', 'memory') == 'redis':
+                    _metrics = RedisMetrics(current_app.config['CACHE_REDIS_URL'])
+                else:
+                    _metrics = MemoryMetrics()
+    return _metrics
+
+def record_llm_call(operation, model, response=None, prompt=None, completion=None,
+                    latency_ms=0.0, error=False, metrics=None):
+    """
+    Record one provider call: tokens (from usage fields when present),
+    latency and cost. ``metrics`` lets callers outside an app context
+    (e.g. the async pipeline) pass the sink explicitly.
+    """
+    if error:
+        prompt_tokens, completion_tokens, estimated = count_tokens(prompt or '', model), 0, True
+    else:
+        prompt_tokens, completion_tokens, estimated = usage_from_response(response, prompt, completion, model)
+    (metrics or get_llm_metrics()).record(operation, model, {
+        'calls': 1,
+        'errors': int(error),
+        'estimated': int(estimated),
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'latency_ms': float(latency_ms),
+        'cost_usd': float(call_cost(model, prompt_tokens, completion_tokens))
+    })
+
+def summarize(totals):
+    """Turn raw totals into per-operation rows with averages"""
+    rows = []
+    for (operation, model), values in sorted(totals.items()):
+        calls = values['calls'] or 1
+        rows.append({
+            'operation': operation,
+            'model': model,
+            'calls': values['calls'],
+            'errors': values['errors'],
+            'estimated_calls': values['estimated'],
+            'prompt_tokens': values['prompt_tokens'],
+            'completion_tokens': values['completion_tokens'],
+            'avg_prompt_tokens': round(values['prompt_tokens'] / calls, 1),
+            'avg_completion_tokens': round(values['completion_tokens'] / calls, 1),
+            'avg_latency_ms': round(values['latency_ms'] / calls, 2),
+            'cost_usd': round(values['cost_usd'], 6)
+        })
+    return rows
@@ -0,0 +1,82 @@
+# User-principal cache for Flask-Login
+#
+# load_user runs on every authenticated request. The columns that
+# authorization reads (role, company, subscription, active flag) are cached
+# as a small tuple for USER_CACHE_TIMEOUT seconds; on a hit the user is put
+# into the session without a query, and any other column (e.g. last_login)
+# loads lazily on first access. The password hash is never cached.
+# Commits that change one of the cached columns drop the entry.
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import db, User
+
+PRINCIPAL_PREFIX = 'user_principal:'
+PRINCIPAL_FIELDS = ('id', 'email', 'name', 'role', 'company_id', 'subscription_id', 'is_active')
+
+def _cache():
+    from app import cache
+    return cache
+
+def _timeout():
+    return current_app.config.get('USER_CACHE_TIMEOUT', 120)
+
+def load_principal(user_id):
+    """User for Flask-Login's user_loader, from the cache when possible"""
+    timeout = _timeout()
+    if timeout:
+        try:
+            snapshot = _cache().get(PRINCIPAL_PREFIX + str(user_id))
+        except Exception as e:
+            print(f"User cache error: {e}")
+            snapshot = None
+        if snapshot:
+            user = User(**dict(zip(PRINCIPAL_FIELDS, snapshot)))
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and timeout:
+        try:
+            _cache().set(PRINCIPAL_PREFIX + str(user_id),
+                         tuple(getattr(user, field) for field in PRINCIPAL_FIELDS),
+                         timeout=timeout)
+        except Exception as e:
+            print(f"User cache error: {e}")
+    return user
+
+def invalidate_principals(*user_ids):
+    """Drop cached principals, e.g. after a bulk UPDATE of users"""
+    if not user_ids:
+        return
+    try:
+        _cache().delete_many(*[PRINCIPAL_PREFIX + str(user_id) for user_id in user_ids])
+    except Exception as e:
+        print(f"User cache error: {e}")
+
+def _after_flush(session, flush_context):
+    changed = session.info.setdefault('principal_invalidate', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = db.inspect(obj)
+        if obj in session.deleted or any(
+            state.attrs[field].history.has_changes() for field in PRINCIPAL_FIELDS
+        ):
+            changed.add(obj.id)
+
+def _after_commit(session):
+    user_ids = session.info.pop('principal_invalidate', None)
+    if user_ids:
+        invalidate_principals(*user_ids)
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('principal_invalidate', None)
+
+def register_principal_listeners():
+    """Drop cached principals when their users change (idempotent)"""
+    for name, fn in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                     ('after_soft_rollback', _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
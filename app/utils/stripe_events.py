@@ -0,0 +1,150 @@
+# Stripe webhook ingestion
+# The endpoint only checks the signature and appends the raw body to a
+# queue; a Celery task drains the queue in batches (see
+# StripeWebhookService). Signing follows Stripe's scheme so events can be
+# produced by a local stub (stripe_stub.py) without a Stripe account.
+
+import hmac
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+class SignatureError(ValueError):
+    """Stripe-Signature header missing, malformed, stale or not matching"""
+
+def sign_payload(payload, secret, timestamp=None):
+    """Build a Stripe-Signature header value for a raw payload"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def verify_signature(payload, header, secret, tolerance=300):
+    """
+    Check a Stripe-Signature header (t=<unix>,v1=<hex hmac>[,v1=...])
+    against the raw request body. Raises SignatureError.
+    """
+    if not header or not secret:
+        raise SignatureError('Missing signature or secret')
+    timestamp, signatures = None, []
+    for item in header.split(','):
+        key, _, value = item.strip().partition('=')
+        if key == 't':
+            timestamp = value
+        elif key == 'v1':
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise SignatureError('Malformed signature header')
+    if tolerance and abs(time.time() - int(timestamp)) > tolerance:
+        raise SignatureError('Timestamp outside the tolerance zone')
+
+    expected = sign_payload(payload, secret, int(timestamp)).split('v1=', 1)[1]
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise SignatureError('No matching signature')
+
+class MemoryEventQueue:
+    """In-process queue for development and tests (drained in the same process)"""
+
+    def __init__(self):
+        self._items = []
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+
+    def push(self, payload):
+        with self._lock:
+            self._items.append(payload)
+
+    def peek(self, count):
+        with self._lock:
+            return self._items[:count]
+
+    def ack(self, count):
+        with self._lock:
+            del self._items[:count]
+
+    def size(self):
+        with self._lock:
+            return len(self._items)
+
+    @contextmanager
+    def drain_lock(self):
+        """Yields a renew() callable while held, None when another drain runs"""
+        acquired = self._drain_lock.acquire(blocking=False)
+        try:
+            yield (lambda: True) if acquired else None
+        finally:
+            if acquired:
+                self._drain_lock.release()
+
+class RedisEventQueue:
+    """
+    Redis list shared by web and Celery workers. Consumers read a batch
+    with LRANGE and trim it only after their transaction commits, so a
+    crashed batch is read again (and deduplicated by event id).
+    """
+
+    KEY = 'stripe_events'
+    LOCK_KEY = 'stripe_events:lock'
+
+    def __init__(self, url, lock_timeout=60):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.lock_timeout = lock_timeout
+
+    def push(self, payload):
+        self.client.rpush(self.KEY, payload)
+
+    def peek(self, count):
+        return self.client.lrange(self.KEY, 0, count - 1)
+
+    def ack(self, count):
+        self.client.ltrim(self.KEY, count, -1)
+
+    def size(self):
+        return self.client.llen(self.KEY)
+
+    @contextmanager
+    def drain_lock(self):
+        """
+        One consumer at a time: peek/ack assume nobody else trims the list.
+        Yields a renew() callable while held (None when another drain
+        runs). renew() resets the lock's timeout and returns False once the
+        lock has expired, in which case another consumer may own the head
+        of the list and the caller must stop without acking.
+        """
+        lock = self.client.lock(self.LOCK_KEY, timeout=self.lock_timeout)
+        acquired = lock.acquire(blocking=False)
+
+        def renew():
+            try:
+                lock.reacquire()
+                return True
+            except Exception as e:
+                print(f"Stripe event lock lost: {e}")
+                return False
+
+        try:
+            yield renew if acquired else None
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception as e:
+                    print(f"Stripe event lock error: {e}")
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_event_queue():
+    """Return the process-wide event queue configured by STRIPE_EVENT_QUEUE"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                if current_app.config.get('STRIPE_EVENT_QUEUE', 'redis') == 'redis':
+                    _queue = RedisEventQueue(current_app.config['STRIPE_EVENT_REDIS_URL'])
+                else:
+                    _queue = MemoryEventQueue()
+    return _queue
@@ -1,128 +1,338 @@
 # Token Oriented Object Notation (TOON) Utility
 # More token-efficient format for LLM communication
+#
+# Two shapes are supported:
+#   record:  key:value|key:value|nested.key:value
+#   table:   name[N]{field,field}:      (header)
+#            value|value                (one row per line)
+# Tables carry field names once, so lists of uniform records cost far
+# fewer tokens than repeating every key the way JSON does.
+
+import re
+
+_TABLE_HEADER = re.compile(r'^\s*(\w*)\[(\d*)\]\{([^}]*)\}:\s*$')
+_NUMBER_START = frozenset('-0123456789')
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return '[' + ','.join(str(v) for v in value) + ']'
+    if value is None:
+        return ''
+    return str(value)
 
 def toon_encode(data, delimiter='|', separator=':'):
     """
     Encode Python dict to TOON format.
-    
+    A list of dicts is encoded as a table (see toon_encode_table).
+
     Args:
-        data: Dictionary to encode
+        data: Dictionary (or list of dictionaries) to encode
         delimiter: Character to separate key-value pairs (default: |)
         separator: Character to separate keys from values (default: :)
-    
+
     Returns:
         TOON formatted string
-    
+
     Example:
         >>> toon_encode({'name': 'John', 'age': 30, 'active': True})
         'name:John|age:30|active:true'
     """
+    if isinstance(data, list):
+        return toon_encode_table(data, delimiter=delimiter)
+
     pairs = []
     for key, value in data.items():
-        if isinstance(value, bool):
-            pairs.append(f"{key}{separator}{str(value).lower()}")
-        elif isinstance(value, (int, float)):
-            pairs.append(f"{key}{separator}{value}")
-        elif isinstance(value, dict):
+        if isinstance(value, dict):
             # Nested dict: use dot notation
-            nested_pairs = []
             for nkey, nvalue in value.items():
-                nested_pairs.append(f"{key}.{nkey}{separator}{nvalue}")
-            pairs.extend(nested_pairs)
-        elif isinstance(value, list):
-            # Lists: comma-separated
-            list_str = ','.join(str(v) for v in value)
-            pairs.append(f"{key}{separator}[{list_str}]")
+                pairs.append(f"{key}.{nkey}{separator}{_format_value(nvalue)}")
         else:
-            pairs.append(f"{key}{separator}{value}")
-    
+            pairs.append(f"{key}{separator}{_format_value(value)}")
+
     return delimiter.join(pairs)
 
-def toon_decode(toon_string, delimiter='|', separator=':'):
+def toon_encode_table(rows, name='items', fields=None, delimiter='|'):
+    """
+    Encode a list of uniform dicts as a TOON table.
+
+    Args:
+        rows: List of dictionaries
+        name: Table name written in the header
+        fields: Column order (default: keys of the first row)
+        delimiter: Character to separate cells (default: |)
+
+    Example:
+        >>> toon_encode_table([{'id': 1, 'ok': True}, {'id': 2, 'ok': False}])
+        'items[2]{id,ok}:\\n1|true\\n2|false'
+    """
+    if fields is None:
+        fields = list(rows[0].keys()) if rows else []
+    lines = [f"{name}[{len(rows)}]{{{','.join(fields)}}}:"]
+    for row in rows:
+        lines.append(delimiter.join(_format_value(row.get(field)) for field in fields))
+    return '\n'.join(lines)
+
+def toon_decode(toon_string, delimiter='|', separator=':', typed=True):
     """
     Decode TOON format to Python dict.
-    
+    A string starting with a table header is decoded as a list of dicts.
+
     Args:
         toon_string: TOON formatted string
         delimiter: Character that separates key-value pairs
         separator: Character that separates keys from values
-    
+        typed: Convert booleans, numbers and lists (default: True);
+               when False every value stays a string
+
     Returns:
-        Python dictionary
-    
+        Python dictionary (or list of dictionaries for tables)
+
     Example:
         >>> toon_decode('name:John|age:30|active:true')
-        {'name': 'John', 'age': '30', 'active': True}
+        {'name': 'John', 'age': 30, 'active': True}
     """
+    toon_string = toon_string.strip()
+    if '\n' in toon_string and _TABLE_HEADER.match(toon_string.split('\n', 1)[0]):
+        return toon_decode_table(toon_string, delimiter=delimiter, typed=typed)
+
     result = {}
-    pairs = toon_string.strip().split(delimiter)
-    
-    for pair in pairs:
-        if separator not in pair:
-            continue
-        
-        parts = pair.split(separator, 1)  # Split only on first occurrence
-        if len(parts) != 2:
+    for pair in toon_string.split(delimiter):
+        key, found, value = pair.partition(separator)
+        if not found:
             continue
-        
-        key, value = parts
-        key = key.strip()
-        value = value.strip()
-        
-        # Handle nested keys (dot notation)
-        if '.' in key:
-            base_key, sub_key = key.split('.', 1)
-            if base_key not in result:
-                result[base_key] = {}
-            result[base_key][sub_key] = _parse_value(value)
-        else:
-            result[key] = _parse_value(value)
-    
+        _set_pair(result, key.strip(), value.strip(), typed)
     return result
 
+def _set_pair(result, key, value, typed):
+    value = _parse_value(value) if typed else value
+    # Handle nested keys (dot notation)
+    base_key, dot, sub_key = key.partition('.')
+    if dot:
+        nested = result.get(base_key)
+        if not isinstance(nested, dict):
+            nested = result[base_key] = {}
+        nested[sub_key] = value
+    else:
+        result[key] = value
+
+def _parse_header(line, delimiter):
+    """Return field names from a "name[N]{a,b}:" header or a plain "a|b" header"""
+    match = _TABLE_HEADER.match(line)
+    if match:
+        return [f.strip() for f in match.group(3).split(',')]
+    return [f.strip() for f in line.split(delimiter)]
+
+def toon_decode_table(toon_string, delimiter='|', typed=True, fields=None):
+    """
+    Decode a TOON table into a list of dicts.
+    Accepts a "name[N]{a,b}:" header or a plain "a|b" header line.
+    Rows with the wrong number of cells are skipped.
+
+    Args:
+        toon_string: TOON table string
+        delimiter: Character that separates cells
+        typed: Convert booleans, numbers and lists (default: True)
+        fields: Column names when the string has no header line
+    """
+    lines = toon_string.strip().splitlines()
+    if fields is None:
+        if not lines:
+            return []
+        fields = _parse_header(lines[0], delimiter)
+        lines = lines[1:]
+
+    rows = []
+    width = len(fields)
+    for line in lines:
+        row = _parse_row(line, fields, width, delimiter, typed)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+def _parse_row(line, fields, width, delimiter, typed):
+    cells = line.split(delimiter)
+    if len(cells) != width:
+        return None
+    if typed:
+        return {field: _parse_value(cell.strip()) for field, cell in zip(fields, cells)}
+    return {field: cell.strip() for field, cell in zip(fields, cells)}
+
 def _parse_value(value):
-    """Parse value to appropriate Python type."""
+    """Parse value to appropriate Python type in a single pass."""
+    if not value:
+        return value
+    first = value[0]
+
     # Boolean
-    if value.lower() == 'true':
-        return True
-    if value.lower() == 'false':
-        return False
-    
+    if len(value) in (4, 5) and first in 'tTfF':
+        lowered = value.lower()
+        if lowered == 'true':
+            return True
+        if lowered == 'false':
+            return False
+        return value
+
     # Number
-    if value.replace('.', '', 1).replace('-', '', 1).isdigit():
-        return float(value) if '.' in value else int(value)
-    
+    if first in _NUMBER_START:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
     # List
-    if value.startswith('[') and value.endswith(']'):
-        items = value[1:-1].split(',')
-        return [item.strip() for item in items if item.strip()]
-    
+    if first == '[' and value[-1] == ']':
+        return [item.strip() for item in value[1:-1].split(',') if item.strip()]
+
     # String (default)
     return value
 
-def compare_formats(data):
+class ToonStreamDecoder:
+    """
+    Incremental TOON decoder for streamed LLM output.
+
+    Feed chunks as they arrive; ``feed`` returns the items completed by that
+    chunk: (key, value) pairs for records, row dicts for tables. ``close``
+    flushes the trailing item and ``result`` returns the full decoded value.
+
+    Example:
+        >>> decoder = ToonStreamDecoder()
+        >>> decoder.feed('valid:tr')
+        []
+        >>> decoder.feed('ue|reason:ok')
+        [('valid', True)]
+        >>> decoder.close()
+        [('reason', 'ok')]
+    """
+
+    def __init__(self, delimiter='|', separator=':', typed=True):
+        self.delimiter = delimiter
+        self.separator = separator
+        self.typed = typed
+        self._buffer = ''
+        self._mode = None  # 'record' or 'table', decided by the first line
+        self._fields = None
+        self._record = {}
+        self._rows = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        completed = []
+
+        if self._mode is None:
+            first_line, newline, rest = self._buffer.partition('\n')
+            first_pair = first_line.split(self.delimiter, 1)[0]
+            if self.delimiter in first_line and self.separator in first_pair:
+                # "key:value|" can only start a record
+                self._mode = 'record'
+            elif not newline:
+                # Wait for the end of the first line to tell a header apart
+                return completed
+            elif _TABLE_HEADER.match(first_line) or self.separator not in first_line:
+                self._mode = 'table'
+                self._fields = _parse_header(first_line, self.delimiter)
+                self._buffer = rest
+            else:
+                self._mode = 'record'
+
+        if self._mode == 'table':
+            *lines, self._buffer = self._buffer.split('\n')
+            for line in lines:
+                completed.extend(self._table_line(line))
+        else:
+            self._buffer = self._buffer.replace('\n', self.delimiter)
+            *pairs, self._buffer = self._buffer.split(self.delimiter)
+            for pair in pairs:
+                completed.extend(self._record_pair(pair))
+        return completed
+
+    def close(self):
+        """Flush the trailing partial item"""
+        remainder, self._buffer = self._buffer, ''
+        if self._mode is None:
+            self._mode = 'record'
+        if self._mode == 'table':
+            return self._table_line(remainder)
+        return self._record_pair(remainder)
+
+    def result(self):
+        return self._rows if self._mode == 'table' else self._record
+
+    def _table_line(self, line):
+        if not line.strip():
+            return []
+        row = _parse_row(line, self._fields, len(self._fields), self.delimiter, self.typed)
+        if row is None:
+            return []
+        self._rows.append(row)
+        return [row]
+
+    def _record_pair(self, pair):
+        key, found, value = pair.partition(self.separator)
+        if not found:
+            return []
+        key = key.strip()
+        _set_pair(self._record, key, value.strip(), self.typed)
+        base_key, dot, sub_key = key.partition('.')
+        value = self._record[base_key][sub_key] if dot else self._record[key]
+        return [(key, value)]
+
+def compare_formats(data, model='gpt-3.5-turbo'):
     """
     Compare token efficiency between JSON and TOON.
     Useful for debugging and optimization.
+    Token counts come from the model's local tokenizer (see llm_metrics).
     """
     import json
-    
+    from app.utils.llm_metrics import count_tokens
+
     json_str = json.dumps(data)
     toon_str = toon_encode(data)
-    
-    json_tokens = len(json_str.split())
-    toon_tokens = len(toon_str.split('|'))
-    
+
     savings = ((len(json_str) - len(toon_str)) / len(json_str)) * 100
-    
+    json_tokens = count_tokens(json_str, model)
+    toon_tokens = count_tokens(toon_str, model)
+
     return {
         'json_length': len(json_str),
         'toon_length': len(toon_str),
         'savings_percent': round(savings, 2),
+        'json_tokens': json_tokens,
+        'toon_tokens': toon_tokens,
+        'token_savings_percent': round((json_tokens - toon_tokens) / json_tokens * 100, 2),
         'json_sample': json_str[:100],
         'toon_sample': toon_str[:100]
     }
 
+def benchmark(data, iterations=10000):
+    """
+    Microbenchmark TOON against json for encode/decode speed and size.
+    Returns microseconds per operation plus compare_formats-style sizes.
+    """
+    import json
+    import timeit
+
+    json_str = json.dumps(data)
+    toon_str = toon_encode(data)
+
+    def per_op(fn):
+        return round(min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6, 3)
+
+    report = compare_formats(data)
+    report.update({
+        'iterations': iterations,
+        'json_encode_us': per_op(lambda: json.dumps(data)),
+        'toon_encode_us': per_op(lambda: toon_encode(data)),
+        'json_decode_us': per_op(lambda: json.loads(json_str)),
+        'toon_decode_us': per_op(lambda: toon_decode(toon_str)),
+    })
+    return report
+
 # Example usage
 if __name__ == '__main__':
     # Test TOON encoding/decoding
@@ -134,23 +344,35 @@ if __name__ == '__main__':
         'category': 'GST',
         'frequency': 'Monthly'
     }
-    
+
     print("Original Data:")
     print(test_data)
     print()
-    
+
     toon = toon_encode(test_data)
     print("TOON Format:")
     print(toon)
     print()
-    
+
     decoded = toon_decode(toon)
     print("Decoded Data:")
     print(decoded)
     print()
-    
+
     comparison = compare_formats(test_data)
     print("Format Comparison:")
     print(f"JSON: {comparison['json_length']} chars")
     print(f"TOON: {comparison['toon_length']} chars")
     print(f"Savings: {comparison['savings_percent']}%")
+    print(f"Tokens: JSON={comparison['json_tokens']} TOON={comparison['toon_tokens']} "
+          f"({comparison['token_savings_percent']}% saved)")
+    print()
+
+    table_data = [dict(test_data, new_due_date=f"2024-04-{day:02d}") for day in range(1, 21)]
+    for label, sample in (('Record', test_data), ('Table (20 rows)', table_data)):
+        report = benchmark(sample, iterations=2000)
+        print(f"{label} benchmark (us/op):")
+        print(f"  encode  json={report['json_encode_us']}  toon={report['toon_encode_us']}")
+        print(f"  decode  json={report['json_decode_us']}  toon={report['toon_decode_us']}")
+        print(f"  size    json={report['json_length']}  toon={report['toon_length']}  savings={report['savings_percent']}%")
+        print(f"  tokens  json={report['json_tokens']}  toon={report['toon_tokens']}  savings={report['token_savings_percent']}%")
@@ -1,34 +1,117 @@
 import re
 
+PAN_PATTERN = r"[A-Z]{5}[0-9]{4}[A-Z]{1}"
+GSTIN_PATTERN = r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}"
+CIN_PATTERN = r'[LU][0-9]{5}[A-Z]{2}[0-9]{4}[A-Z]{3}[0-9]{6}'
+
+# Compiled once; IGNORECASE avoids an upper() copy per call
+_PAN_MATCH = re.compile(PAN_PATTERN, re.IGNORECASE).fullmatch
+_GSTIN_MATCH = re.compile(GSTIN_PATTERN, re.IGNORECASE).fullmatch
+_CIN_MATCH = re.compile(CIN_PATTERN, re.IGNORECASE).fullmatch
+_EMAIL_MATCH = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$').match
+
+# GSTIN check digit: each of the first 14 characters contributes
+# (value * weight) // 36 + (value * weight) % 36, with weights 1,2,1,2,...
+# Contributions are tabulated per weight (lower case mapped like upper case)
+# so the checksum is two C-level sums instead of a Python loop.
+_GSTIN_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def _contributions(weight):
+    table = {}
+    for value, char in enumerate(_GSTIN_CHARSET):
+        product = value * weight
+        table[char] = table[char.lower()] = product // 36 + product % 36
+    return table
+
+_WEIGHT_1 = _contributions(1).__getitem__
+_WEIGHT_2 = _contributions(2).__getitem__
+
+def gstin_check_digit(gstin):
+    """Compute the mod-36 check character for the first 14 GSTIN characters"""
+    total = sum(map(_WEIGHT_1, gstin[0:14:2])) + sum(map(_WEIGHT_2, gstin[1:14:2]))
+    return _GSTIN_CHARSET[-total % 36]
+
 def validate_pan(pan):
     """Validate PAN format"""
     if not pan:
         return False
-    pattern = r"[A-Z]{5}[0-9]{4}[A-Z]{1}"
-    return bool(re.match(pattern, pan.upper()))
+    return _PAN_MATCH(pan) is not None
 
-def validate_gstin(gstin):
-    """Validate GSTIN format"""
-    if not gstin:
+def validate_gstin(gstin, checksum=True):
+    """Validate GSTIN format and (by default) its check digit"""
+    if not gstin or _GSTIN_MATCH(gstin) is None:
         return False
-    pattern = r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}"
-    return bool(re.match(pattern, gstin.upper()))
+    return not checksum or gstin_check_digit(gstin) == gstin[14].upper()
 
 def extract_pan_from_gstin(gstin):
     """Extract PAN from GSTIN"""
     if validate_gstin(gstin):
-        return gstin[2:12]
+        return gstin[2:12].upper()
     return None
 
 def validate_email(email):
     """Basic email validation"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return _EMAIL_MATCH(email) is not None
 
 def validate_cin(cin):
     """Validate CIN/LLPIN format (basic check)"""
     if not cin:
         return True  # CIN is optional
     # Basic pattern: L/U followed by digits
-    pattern = r'[LU][0-9]{5}[A-Z]{2}[0-9]{4}[A-Z]{3}[0-9]{6}'
-    return bool(re.match(pattern, cin.upper()))
+    return _CIN_MATCH(cin) is not None
+
+_VALIDATORS = {
+    'pan': validate_pan,
+    'gstin': validate_gstin,
+    'cin': validate_cin,
+    'email': validate_email,
+}
+
+def validate_many(values, kind):
+    """
+    Validate a batch of identifiers in one call.
+
+    Args:
+        values: Iterable of strings (None/empty entries are handled like
+                the single-value validators do)
+        kind: 'pan', 'gstin', 'cin' or 'email'
+
+    Returns:
+        List of booleans, one per value
+    """
+    validator = _VALIDATORS[kind]
+    return list(map(validator, values))
+
+def benchmark(count=100000):
+    """
+    Time each validator per identifier: the previous uncompiled
+    re.match + upper() check, single calls and validate_many.
+    Returns nanoseconds per identifier.
+    """
+    import timeit
+
+    patterns = {'pan': PAN_PATTERN, 'gstin': GSTIN_PATTERN, 'cin': CIN_PATTERN}
+
+    samples = {
+        'pan': ['ABCDE1234F', 'ABCDE12345', 'abcde1234f', 'XYZAB9876C'],
+        'gstin': ['27AAPFU0939F1ZV', '27AAPFU0939F1Z5', '29ABCDE1234F1Z5', '07aapfu0939f1zv'],
+        'cin': ['U12345MH2023PTC123456', 'L67120MH1995PLC085577', 'X1234', ''],
+    }
+    report = {}
+    for kind, base in samples.items():
+        values = (base * (count // len(base) + 1))[:count]
+        validator = _VALIDATORS[kind]
+        pattern = patterns[kind]
+        legacy = min(timeit.repeat(lambda: [bool(re.match(pattern, v.upper())) for v in values], number=1, repeat=3))
+        single = min(timeit.repeat(lambda: [validator(v) for v in values], number=1, repeat=3))
+        batch = min(timeit.repeat(lambda: validate_many(values, kind), number=1, repeat=3))
+        report[kind] = {
+            'legacy_ns': round(legacy / count * 1e9, 1),
+            'single_ns': round(single / count * 1e9, 1),
+            'batch_ns': round(batch / count * 1e9, 1),
+        }
+    return report
+
+if __name__ == '__main__':
+    for kind, timings in benchmark().items():
+        print(f"{kind:6} legacy={timings['legacy_ns']}  single={timings['single_ns']} ns/id  batch={timings['batch_ns']} ns/id")
@@ -1,8 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify
 from flask_login import login_required, current_user
-from app.models import db, User, Company, Subscription, SubscriptionPlan, AuditLog, Invoice
+from app.models import db, User, Subscription, SubscriptionPlan
 from app.utils.decorators import admin_required, log_audit
-from sqlalchemy import func, desc
+from app.services.audit_service import AuditService
+from app.services.metrics_service import MetricsService
+from app.services.subscription_service import SubscriptionService
+from sqlalchemy import desc
 from datetime import datetime, timedelta
 
 bp = Blueprint('admin', __name__)
@@ -12,36 +15,21 @@ bp = Blueprint('admin', __name__)
 @admin_required
 def dashboard():
     """Super Admin Dashboard"""
-    # System Stats
-    total_users = User.query.count()
-    total_practitioners = User.query.filter(
-        User.role.in_(['practitioner_admin', 'practitioner_staff'])
-    ).count()
-    total_companies = Company.query.count()
-    active_subscriptions = Subscription.query.filter_by(status='active').count()
-    
-    # Revenue stats
-    total_revenue = db.session.query(func.sum(Invoice.amount)).filter_by(status='paid').scalar() or 0
+    # System stats from the materialized snapshot (one lookup)
+    metrics = MetricsService.get_snapshot()
     
     # Recent activity
-    recent_logs = AuditLog.query.order_by(desc(AuditLog.timestamp)).limit(20).all()
-    
-    # Subscription distribution
-    subscription_stats = db.session.query(
-        SubscriptionPlan.name,
-        func.count(Subscription.id).label('count')
-    ).join(Subscription).filter(
-        Subscription.status == 'active'
-    ).group_by(SubscriptionPlan.name).all()
+    recent_logs = AuditService.recent(20)
     
     return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         total_practitioners=total_practitioners,
-                         total_companies=total_companies,
-                         active_subscriptions=active_subscriptions,
-                         total_revenue=total_revenue,
+                         total_users=metrics['total_users'],
+                         total_practitioners=metrics['total_practitioners'],
+                         total_companies=metrics['total_companies'],
+                         active_subscriptions=metrics['active_subscriptions'],
+                         total_revenue=metrics['total_revenue'],
                          recent_logs=recent_logs,
-                         subscription_stats=subscription_stats)
+                         subscription_stats=[p for p in metrics['plans'] if p[1]],
+                         metrics_refreshed_at=metrics['refreshed_at'])
 
 @bp.route('/users')
 @login_required
@@ -104,6 +92,7 @@ def cancel_subscription(sub_id):
     subscription.status = 'canceled'
     subscription.current_period_end = datetime.utcnow()
     db.session.commit()
+    SubscriptionService.invalidate(sub_id)
     
     log_audit('SUBSCRIPTION_CANCEL', f'Subscription {sub_id} canceled by admin')
     flash('Subscription canceled', 'success')
@@ -146,18 +135,19 @@ def create_plan():
 @admin_required
 def audit_logs():
     """View audit logs"""
-    page = request.args.get('page', 1, type=int)
     action_filter = request.args.get('action', None)
-    
-    query = AuditLog.query
-    if action_filter:
-        query = query.filter_by(action=action_filter)
-    
-    logs_pagination = query.order_by(desc(AuditLog.timestamp)).paginate(
-        page=page, per_page=100, error_out=False
-    )
-    
-    return render_template('admin/audit_logs.html', logs=logs_pagination)
+    before = request.args.get('before', None)
+    
+    # Keyset pagination: no OFFSET scan or COUNT(*) over the whole table
+    try:
+        logs, next_before = AuditService.query_logs(action=action_filter, before=before, limit=100)
+    except ValueError:
+        abort(400)
+    
+    return render_template('admin/audit_logs.html',
+                         logs=logs,
+                         action=action_filter,
+                         next_before=next_before)
 
 @bp.route('/impersonate/<int:user_id>')
 @login_required
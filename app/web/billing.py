@@ -1,9 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, current_app
 from flask_login import login_required, current_user
-from app.models import db, Subscription, SubscriptionPlan, Invoice
+from app.models import db, Subscription, SubscriptionPlan, Invoice, UsageCharge
 from app.services.subscription_service import SubscriptionService
 from app.services.billing_service import BillingService
 from app.utils.decorators import role_required, log_audit
+from app.utils.stripe_events import verify_signature, get_event_queue, SignatureError
+from app import limiter
 from datetime import datetime
 
 bp = Blueprint('billing', __name__)
@@ -110,7 +112,10 @@ def view_invoice(invoice_id):
         if not current_user.is_super_admin:
             abort(403)
     
-    return render_template('billing/invoice.html', invoice=invoice)
+    # Line items are only loaded here; dashboards read the usage summary
+    charges = UsageCharge.query.filter_by(invoice_id=invoice.id).order_by(UsageCharge.charged_at).all()
+    
+    return render_template('billing/invoice.html', invoice=invoice, charges=charges)
 
 @bp.route('/plans')
 @login_required
@@ -122,3 +127,31 @@ def view_plans():
     return render_template('billing/plans.html',
                          plans=plans,
                          current_subscription=current_subscription)
+
+@bp.route('/webhook/stripe', methods=['POST'])
+@limiter.exempt
+def stripe_webhook():
+    """
+    Stripe webhook: verify the signature and queue the raw event.
+    Events are applied in batches by the process_stripe_events task, so
+    bursts never hold a web worker on database writes.
+    """
+    payload = request.get_data(cache=False)
+    try:
+        verify_signature(
+            payload,
+            request.headers.get('Stripe-Signature'),
+            current_app.config.get('STRIPE_WEBHOOK_SECRET'),
+            current_app.config.get('STRIPE_WEBHOOK_TOLERANCE', 300)
+        )
+    except SignatureError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        get_event_queue().push(payload)
+    except Exception as e:
+        # Non-2xx makes Stripe retry the delivery later
+        print(f"Stripe Webhook Error: {e}")
+        return jsonify({'error': 'Queue unavailable'}), 503
+    
+    return jsonify({'received': True}), 200
@@ -6,10 +6,10 @@ from app.utils.tokens import generate_share_token, verify_share_token
 from app.utils.decorators import role_required, log_audit, subscription_required
 from app.services.subscription_service import SubscriptionService
 from app.services.billing_service import BillingService
-import os
+from app.services.stats_service import StatsService
+from app.services.document_service import DocumentService
+from app.services.import_service import CompanyImportService
 from werkzeug.utils import secure_filename
-from flask import current_app
-from datetime import datetime
 
 bp= Blueprint('dashboard', __name__)
 
@@ -33,16 +33,9 @@ def practitioner_dashboard():
         is_active=True
     ).all()
     
-    # Get compliance stats
-    total_compliances = 0
-    pending_count = 0
-    overdue_count = 0
-    
-    for company in companies:
-        records = ComplianceRecord.query.filter_by(company_id=company.id).all()
-        total_compliances += len(records)
-        pending_count += sum(1 for r in records if r.status == 'Pending')
-        overdue_count += sum(1 for r in records if r.status == 'Overdue')
+    # Get compliance stats in one grouped query
+    stats = StatsService.get_practitioner_stats(current_user.id)
+    totals = stats['totals']
     
     # Usage info
     usage = None
@@ -53,9 +46,10 @@ def practitioner_dashboard():
                          companies=companies,
                          subscription=subscription,
                          usage=usage,
-                         total_compliances=total_compliances,
-                         pending_count=pending_count,
-                         overdue_count=overdue_count)
+                         company_stats=stats['per_company'],
+                         total_compliances=totals['total'],
+                         pending_count=totals['pending'],
+                         overdue_count=totals['overdue'])
 
 @bp.route('/company/add', methods=['GET', 'POST'])
 @login_required
@@ -72,14 +66,15 @@ def add_company():
     
     if request.method == 'POST':
         name = request.form.get('name')
-        cin = request.form.get('cin')
-        gstin = request.form.get('gstin')
-        pan = request.form.get('pan')
+        # Identifiers are stored upper case, as extract_pan_from_gstin returns them
+        cin = (request.form.get('cin') or '').strip().upper()
+        gstin = (request.form.get('gstin') or '').strip().upper()
+        pan = (request.form.get('pan') or '').strip().upper()
         
         # Validation
         if gstin:
             if not validate_gstin(gstin):
-                flash('Invalid GSTIN format', 'error')
+                flash('Invalid GSTIN (format or check digit)', 'error')
                 return redirect(url_for('dashboard.add_company'))
             extracted_pan = extract_pan_from_gstin(gstin)
             if pan and pan != extracted_pan:
@@ -98,8 +93,8 @@ def add_company():
         # Create company
         company = Company(
             name=name,
-            cin=cin,
-            gstin=gstin,
+            cin=cin or None,
+            gstin=gstin or None,
             pan=pan,
             practitioner_id=current_user.id,
             is_active=True
@@ -119,6 +114,42 @@ def add_company():
     
     return render_template('dashboard/add_company.html', message=message)
 
+@bp.route('/company/import', methods=['GET', 'POST'])
+@login_required
+@role_required('practitioner_admin', 'practitioner_staff')
+@subscription_required
+def import_companies():
+    """Bulk import companies from CSV/XLSX"""
+    subscription = SubscriptionService.get_active_subscription(current_user)
+    report = None
+    
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(url_for('dashboard.import_companies'))
+        
+        try:
+            report = CompanyImportService.import_companies(
+                file, current_user, subscription,
+                dry_run=request.form.get('dry_run') == '1'
+            )
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('dashboard.import_companies'))
+        except Exception as e:
+            db.session.rollback()
+            print(f"Company Import Error: {e}")
+            flash('Could not read the uploaded file', 'error')
+            return redirect(url_for('dashboard.import_companies'))
+        
+        if report['imported']:
+            log_audit('IMPORT_COMPANIES', f"Imported {report['imported']} companies ({report['failed']} rejected)")
+            if report['charge']:
+                flash(f"{report['extra_companies']} companies exceed your plan: ₹{report['charge']} added to your next invoice", 'warning')
+    
+    return render_template('dashboard/import_companies.html', report=report)
+
 @bp.route('/company/<int:company_id>')
 @login_required
 def company_view(company_id):
@@ -145,6 +176,21 @@ def company_view(company_id):
                          documents=documents,
                          readonly=False)
 
+@bp.route('/document/<int:document_id>/download')
+@login_required
+def download_document(document_id):
+    """Download document"""
+    doc = Document.query.get_or_404(document_id)
+    company = doc.company
+    
+    # RBAC Check
+    if current_user.is_practitioner and company.practitioner_id != current_user.id:
+        abort(403)
+    if current_user.is_company_user and current_user.company_id != company.id:
+        abort(403)
+    
+    return DocumentService.download_response(doc)
+
 @bp.route('/company/<int:company_id>/share')
 @login_required
 @role_required('practitioner_admin')
@@ -205,33 +251,13 @@ def upload_document(company_id):
         return redirect(url_for('dashboard.company_view', company_id=company_id))
     
     if file:
-        filename = secure_filename(file.filename)
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(company.id))
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Add timestamp to filename to avoid conflicts
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{timestamp}{ext}"
+        file.filename = secure_filename(file.filename)
+        doc, created = DocumentService.save_upload(company, file, user_id=current_user.id)
         
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
-        doc = Document(
-            company_id=company.id,
-            filename=filename,
-            file_path=file_path,
-            file_size=file_size,
-            mime_type=file.content_type,
-            uploaded_by=current_user.id
-        )
-        db.session.add(doc)
-        db.session.commit()
-        
-        log_audit('UPLOAD_DOCUMENT', f'Uploaded {filename} for {company.name}')
-        flash('File uploaded successfully', 'success')
+        log_audit('UPLOAD_DOCUMENT', f'Uploaded {doc.filename} for {company.name}')
+        if created:
+            flash('File uploaded successfully', 'success')
+        else:
+            flash('File uploaded successfully (identical file already stored)', 'success')
     
     return redirect(url_for('dashboard.company_view', company_id=company_id))
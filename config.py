@@ -31,10 +31,35 @@ class Config:
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
     
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')  # Override for proxies or local stubs
+    ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL')
+    
+    # Async LLM Pipeline
+    LLM_CONCURRENCY = int(os.environ.get('LLM_CONCURRENCY', 10))
+    OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', 5))
+    ANTHROPIC_MAX_CONCURRENCY = int(os.environ.get('ANTHROPIC_MAX_CONCURRENCY', 5))
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+    LLM_BATCH_SIZE = int(os.environ.get('LLM_BATCH_SIZE', 1))  # Texts per extraction request
+    
+    # LLM Extraction Cache (redis, memory or none)
+    LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'redis')
+    LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1024))
+    
+    # LLM Usage Metrics (redis or memory)
+    LLM_METRICS_BACKEND = os.environ.get('LLM_METRICS_BACKEND', 'redis')
+    TIKTOKEN_CACHE_DIR = os.environ.get('TIKTOKEN_CACHE_DIR')  # Pre-fetched BPE files; unset uses the estimator
+    
     # Stripe
     STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY')
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
     STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+    STRIPE_WEBHOOK_TOLERANCE = int(os.environ.get('STRIPE_WEBHOOK_TOLERANCE', 300))  # Max signature age, seconds
+    
+    # Stripe webhook queue (redis or memory); events are applied in batches by Celery
+    STRIPE_EVENT_QUEUE = os.environ.get('STRIPE_EVENT_QUEUE', 'redis')
+    STRIPE_EVENT_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/3'
+    STRIPE_EVENT_BATCH_SIZE = int(os.environ.get('STRIPE_EVENT_BATCH_SIZE', 100))
     
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -46,7 +71,36 @@ class Config:
     
     # Uploads
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max file size
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))  # Bytes per write when storing uploads
+    
+    # Document downloads: '' (sendfile via the WSGI server), 'x-accel' (nginx) or 'x-sendfile' (Apache)
+    DOCUMENT_SENDFILE = os.environ.get('DOCUMENT_SENDFILE', '')
+    DOCUMENT_ACCEL_PREFIX = os.environ.get('DOCUMENT_ACCEL_PREFIX', '/protected-uploads/')  # nginx internal location for UPLOAD_FOLDER
+    DOCUMENT_MAX_AGE = int(os.environ.get('DOCUMENT_MAX_AGE', 3600))
+    
+    # JSON API pagination
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+    
+    # JSON API response cache (entries are invalidated by version counters)
+    API_CACHE_ENABLED = os.environ.get('API_CACHE_ENABLED', 'true').lower() == 'true'
+    API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+    
+    # Logged-in user's role/company/subscription for Flask-Login (0 disables)
+    USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 120))
+    
+    # Current user's subscription + plan, cached across requests (0 disables)
+    SUBSCRIPTION_CACHE_TIMEOUT = int(os.environ.get('SUBSCRIPTION_CACHE_TIMEOUT', 60))
+    SUBSCRIPTION_GRACE_DAYS = int(os.environ.get('SUBSCRIPTION_GRACE_DAYS', 7))  # Unpaid days past due before past_due
+    
+    # Audit log writer (queued in-process, inserted in batches by a background thread)
+    AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'true').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))  # Seconds
+    AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', 12))  # Older months are archived and dropped
+    AUDIT_ARCHIVE_FOLDER = os.environ.get('AUDIT_ARCHIVE_FOLDER', os.path.join(os.getcwd(), 'archives', 'audit'))
     
     # Rate Limiting
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/2'
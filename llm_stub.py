@@ -0,0 +1,135 @@
+"""
+Local stand-in for the OpenAI and Anthropic APIs: answers chat
+completions (single and batched TOON extraction) and messages (TOON
+validation) after a fixed delay, optionally with 429s, so the async
+pipeline can be exercised without API keys.
+
+    python llm_stub.py --port 8765 --delay 0.5 --rate-limit-every 50
+
+then point the app at it:
+
+    OPENAI_BASE_URL=http://localhost:8765/v1 ANTHROPIC_BASE_URL=http://localhost:8765
+
+or run the pipeline against it directly and compare with the sequential time:
+
+    python llm_stub.py --bench 200 --concurrency 50
+"""
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+EXTRACTION = 'compliance_name:GST GSTR-3B|new_due_date:2024-04-25|financial_year:2023-2024|is_permanent:false'
+BATCH_HEADER = 'id|compliance_name|new_due_date|financial_year|is_permanent'
+
+def make_handler(delay, rate_limit_every):
+    counter = {'requests': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            with lock:
+                counter['requests'] += 1
+                throttled = rate_limit_every and counter['requests'] % rate_limit_every == 0
+            if throttled:
+                return self._send(429, {'error': {'message': 'Rate limited', 'type': 'rate_limit_error'}},
+                                  {'retry-after': '0.2'})
+            time.sleep(delay)
+
+            prompt = body['messages'][0]['content']
+            if self.path.endswith('/chat/completions'):
+                if 'TOON table' in prompt:
+                    count = prompt.count('\n[')
+                    content = '\n'.join([BATCH_HEADER] + [
+                        f"{i}|GST GSTR-3B|2024-04-25|2023-2024|false" for i in range(1, count + 1)
+                    ])
+                else:
+                    content = EXTRACTION
+                return self._send(200, {
+                    'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': content}}],
+                    'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                              'total_tokens': (len(prompt) + len(content)) // 4}
+                })
+            if self.path.endswith('/messages'):
+                content = 'valid:true|reason:Data matches text'
+                return self._send(200, {
+                    'id': 'msg_stub', 'type': 'message', 'role': 'assistant', 'model': body['model'],
+                    'content': [{'type': 'text', 'text': content}],
+                    'stop_reason': 'end_turn', 'stop_sequence': None,
+                    'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(content) // 4}
+                })
+            self._send(404, {'error': {'message': f"Unknown path {self.path}"}})
+
+    return Handler
+
+def serve(port, delay, rate_limit_every):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(delay, rate_limit_every))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def bench(port, count, concurrency, batch_size):
+    from app.llm_engine import AsyncPipeline
+    from app.utils.llm_metrics import MemoryMetrics
+
+    pipeline = AsyncPipeline(
+        openai_api_key='stub', anthropic_api_key='stub',
+        openai_base_url=f"http://127.0.0.1:{port}/v1", anthropic_base_url=f"http://127.0.0.1:{port}",
+        concurrency=concurrency, openai_concurrency=concurrency, anthropic_concurrency=concurrency,
+        batch_size=batch_size, metrics=MemoryMetrics()
+    )
+    texts = [f"Circular {n}: the due date for GST GSTR-3B is extended to 25th April 2024." for n in range(count)]
+    started = time.perf_counter()
+    try:
+        results = await pipeline.process_many(texts)
+    finally:
+        await pipeline.close()
+    return results, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub OpenAI/Anthropic server for the LLM pipeline')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.5, help='Seconds per response')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Answer every Nth request with a 429')
+    parser.add_argument('--bench', type=int, default=0, help='Run this many texts through the pipeline and exit')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.delay, args.rate_limit_every)
+    if not args.bench:
+        print(f"Stub listening on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        server.shutdown()
+        return
+
+    results, elapsed = asyncio.run(bench(args.port, args.bench, args.concurrency, args.batch_size))
+    server.shutdown()
+    extracted = sum(1 for rows in results if rows)
+    calls_per_text = 2 if args.batch_size == 1 else 1 + 1 / args.batch_size
+    print(f"{extracted}/{len(results)} texts extracted in {elapsed:.2f}s "
+          f"(sequential would be about {args.bench * calls_per_text * args.delay:.1f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""Add composite company/status index on compliance_record
+
+Revision ID: a1c4e7d2b9f0
+Revises: f2f31b58a62f
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e7d2b9f0'
+down_revision = 'f2f31b58a62f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.create_index('ix_compliance_record_company_status', ['company_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_compliance_record_company_status')
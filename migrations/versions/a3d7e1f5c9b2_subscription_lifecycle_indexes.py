@@ -0,0 +1,32 @@
+"""Add indexes for the subscription lifecycle sweep
+
+Revision ID: a3d7e1f5c9b2
+Revises: f1c6a8e3b7d4
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7e1f5c9b2'
+down_revision = 'f1c6a8e3b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subscription', schema=None) as batch_op:
+        batch_op.create_index('ix_subscription_status_period_end', ['status', 'current_period_end'], unique=False)
+
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.create_index('ix_invoice_status_due_date', ['status', 'due_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.drop_index('ix_invoice_status_due_date')
+
+    with op.batch_alter_table('subscription', schema=None) as batch_op:
+        batch_op.drop_index('ix_subscription_status_period_end')
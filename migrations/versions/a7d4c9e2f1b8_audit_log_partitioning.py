@@ -0,0 +1,103 @@
+"""Partition audit_log by month on Postgres; add (action, timestamp) index
+
+Revision ID: a7d4c9e2f1b8
+Revises: f6c1d8e4a2b9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4c9e2f1b8'
+down_revision = 'f6c1d8e4a2b9'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, user_id, action, details, ip_address, timestamp'
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Other databases use rollover tables managed by AuditService
+        with op.batch_alter_table('audit_log', schema=None) as batch_op:
+            batch_op.create_index('ix_audit_log_action_timestamp', ['action', 'timestamp'], unique=False)
+        return
+
+    # The partition key must be part of the primary key and NOT NULL
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_legacy")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX IF EXISTS ix_audit_log_action")
+    op.execute("DROP INDEX IF EXISTS ix_audit_log_timestamp")
+    op.execute(
+        "CREATE TABLE audit_log ("
+        "id integer NOT NULL DEFAULT nextval('audit_log_id_seq'), "
+        "user_id integer REFERENCES \"user\" (id), "
+        "action varchar(50) NOT NULL, "
+        "details varchar(255), "
+        "ip_address varchar(50), "
+        "timestamp timestamp without time zone NOT NULL DEFAULT (now() at time zone 'utc'), "
+        "PRIMARY KEY (id, timestamp)"
+        ") PARTITION BY RANGE (timestamp)"
+    )
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+    op.execute("CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT")
+    op.execute("CREATE INDEX ix_audit_log_action ON audit_log (action)")
+    op.execute("CREATE INDEX ix_audit_log_timestamp ON audit_log (timestamp)")
+    op.execute("CREATE INDEX ix_audit_log_action_timestamp ON audit_log (action, timestamp)")
+
+    # Monthly partitions from the oldest row to two months ahead
+    oldest = bind.execute(sa.text("SELECT min(timestamp) FROM audit_log_legacy")).scalar()
+    now = datetime.utcnow()
+    month = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _next_month(_next_month(datetime(now.year, now.month, 1)))
+    while month <= last:
+        upper = _next_month(month)
+        op.execute(
+            f"CREATE TABLE audit_log_{month:%Y_%m} PARTITION OF audit_log "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        month = upper
+
+    op.execute(
+        f"INSERT INTO audit_log ({COLUMNS}) "
+        f"SELECT id, user_id, action, details, ip_address, COALESCE(timestamp, now() at time zone 'utc') "
+        f"FROM audit_log_legacy"
+    )
+    op.execute("DROP TABLE audit_log_legacy")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('audit_log', schema=None) as batch_op:
+            batch_op.drop_index('ix_audit_log_action_timestamp')
+        return
+
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_partitioned")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX IF EXISTS ix_audit_log_action")
+    op.execute("DROP INDEX IF EXISTS ix_audit_log_timestamp")
+    op.execute("DROP INDEX IF EXISTS ix_audit_log_action_timestamp")
+    op.execute(
+        "CREATE TABLE audit_log ("
+        "id integer NOT NULL DEFAULT nextval('audit_log_id_seq') PRIMARY KEY, "
+        "user_id integer REFERENCES \"user\" (id), "
+        "action varchar(50) NOT NULL, "
+        "details varchar(255), "
+        "ip_address varchar(50), "
+        "timestamp timestamp without time zone"
+        ")"
+    )
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+    op.execute(f"INSERT INTO audit_log ({COLUMNS}) SELECT {COLUMNS} FROM audit_log_partitioned")
+    op.execute("DROP TABLE audit_log_partitioned CASCADE")
+    op.execute("CREATE INDEX ix_audit_log_action ON audit_log (action)")
+    op.execute("CREATE INDEX ix_audit_log_timestamp ON audit_log (timestamp)")
@@ -0,0 +1,31 @@
+"""Add metric_snapshot table for materialized admin metrics
+
+Revision ID: b2e9f4a6c8d1
+Revises: a7d4c9e2f1b8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e9f4a6c8d1'
+down_revision = 'a7d4c9e2f1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('metric_snapshot',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('label', sa.String(length=100), nullable=True),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('metric_snapshot')
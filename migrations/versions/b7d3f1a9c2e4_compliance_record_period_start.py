@@ -0,0 +1,28 @@
+"""Add period_start to compliance_record for calendar generation
+
+Revision ID: b7d3f1a9c2e4
+Revises: a1c4e7d2b9f0
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f1a9c2e4'
+down_revision = 'a1c4e7d2b9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('period_start', sa.Date(), nullable=True))
+        batch_op.create_unique_constraint('uq_compliance_record_period', ['company_id', 'compliance_id', 'period_start'])
+
+
+def downgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_compliance_record_period', type_='unique')
+        batch_op.drop_column('period_start')
@@ -0,0 +1,32 @@
+"""Add indexes for per-subscription company counts
+
+Revision ID: c4f7a1e9d3b6
+Revises: b2e9f4a6c8d1
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a1e9d3b6'
+down_revision = 'b2e9f4a6c8d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_subscription_id'), ['subscription_id'], unique=False)
+
+    with op.batch_alter_table('company', schema=None) as batch_op:
+        batch_op.create_index('ix_company_practitioner_active', ['practitioner_id', 'is_active'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('company', schema=None) as batch_op:
+        batch_op.drop_index('ix_company_practitioner_active')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_subscription_id'))
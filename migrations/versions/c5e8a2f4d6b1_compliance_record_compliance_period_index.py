@@ -0,0 +1,26 @@
+"""Add compliance/period index on compliance_record for override propagation
+
+Revision ID: c5e8a2f4d6b1
+Revises: b7d3f1a9c2e4
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a2f4d6b1'
+down_revision = 'b7d3f1a9c2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.create_index('ix_compliance_record_compliance_period', ['compliance_id', 'period_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_compliance_record_compliance_period')
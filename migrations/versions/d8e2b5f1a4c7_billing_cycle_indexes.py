@@ -0,0 +1,32 @@
+"""Add indexes for the billing cycle run
+
+Revision ID: d8e2b5f1a4c7
+Revises: c4f7a1e9d3b6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2b5f1a4c7'
+down_revision = 'c4f7a1e9d3b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subscription', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_subscription_next_billing_date'), ['next_billing_date'], unique=False)
+
+    with op.batch_alter_table('usage_charge', schema=None) as batch_op:
+        batch_op.create_index('ix_usage_charge_subscription_invoiced', ['subscription_id', 'invoiced'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('usage_charge', schema=None) as batch_op:
+        batch_op.drop_index('ix_usage_charge_subscription_invoiced')
+
+    with op.batch_alter_table('subscription', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscription_next_billing_date'))
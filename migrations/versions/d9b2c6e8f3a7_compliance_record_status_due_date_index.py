@@ -0,0 +1,26 @@
+"""Add status/due_date index on compliance_record for the overdue sweep
+
+Revision ID: d9b2c6e8f3a7
+Revises: c5e8a2f4d6b1
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b2c6e8f3a7'
+down_revision = 'c5e8a2f4d6b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.create_index('ix_compliance_record_status_due_date', ['status', 'due_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_compliance_record_status_due_date')
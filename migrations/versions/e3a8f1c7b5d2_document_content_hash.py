@@ -0,0 +1,28 @@
+"""Add content_hash to document for the content-addressed blob store
+
+Revision ID: e3a8f1c7b5d2
+Revises: d9b2c6e8f3a7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8f1c7b5d2'
+down_revision = 'd9b2c6e8f3a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_document_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_content_hash'))
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,46 @@
+"""Add subscription_usage table for materialized billing usage
+
+Revision ID: e5b9c3d7f2a8
+Revises: d8e2b5f1a4c7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3d7f2a8'
+down_revision = 'd8e2b5f1a4c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('subscription_usage',
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('company_count', sa.Integer(), nullable=False),
+    sa.Column('pending_charge_count', sa.Integer(), nullable=False),
+    sa.Column('pending_amount', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['subscription_id'], ['subscription.id'], ),
+    sa.PrimaryKeyConstraint('subscription_id')
+    )
+
+    # Backfill one row per existing subscription
+    op.execute("""
+        INSERT INTO subscription_usage (subscription_id, company_count, pending_charge_count, pending_amount, updated_at)
+        SELECT s.id,
+               (SELECT COUNT(c.id) FROM company c JOIN "user" u ON u.id = c.practitioner_id
+                WHERE u.subscription_id = s.id AND c.is_active = TRUE),
+               (SELECT COUNT(uc.id) FROM usage_charge uc
+                WHERE uc.subscription_id = s.id AND uc.invoiced = FALSE),
+               (SELECT COALESCE(SUM(uc.amount), 0) FROM usage_charge uc
+                WHERE uc.subscription_id = s.id AND uc.invoiced = FALSE),
+               CURRENT_TIMESTAMP
+        FROM subscription s
+    """)
+
+
+def downgrade():
+    op.drop_table('subscription_usage')
@@ -0,0 +1,37 @@
+"""Add stripe_event table for webhook deduplication and index Stripe invoice ids
+
+Revision ID: f1c6a8e3b7d4
+Revises: e5b9c3d7f2a8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a8e3b7d4'
+down_revision = 'e5b9c3d7f2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stripe_event',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_invoice_stripe_invoice_id'), ['stripe_invoice_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_invoice_stripe_invoice_id'))
+
+    op.drop_table('stripe_event')
@@ -0,0 +1,26 @@
+"""Add company/due_date/id index on compliance_record for keyset pagination
+
+Revision ID: f6c1d8e4a2b9
+Revises: e3a8f1c7b5d2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c1d8e4a2b9'
+down_revision = 'e3a8f1c7b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.create_index('ix_compliance_record_company_due_date', ['company_id', 'due_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('compliance_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_compliance_record_company_due_date')
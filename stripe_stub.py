@@ -0,0 +1,85 @@
+"""
+Local Stripe webhook stub: signs events with STRIPE_WEBHOOK_SECRET the way
+Stripe does and posts them to the webhook endpoint, optionally as a burst.
+
+    python stripe_stub.py --invoice in_123 --subscription sub_123 --count 500 --concurrency 20
+
+Duplicate deliveries (--duplicates) exercise deduplication by event id.
+Prints response-time percentiles for the endpoint.
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.stripe_events import sign_payload
+
+def build_events(invoices, subscriptions, count):
+    """Cycle through invoice.paid and customer.subscription.updated events"""
+    templates = [('invoice.paid', {'id': i, 'object': 'invoice', 'payment_intent': f"pi_{uuid.uuid4().hex[:14]}"})
+                 for i in invoices]
+    now = int(time.time())
+    templates += [('customer.subscription.updated', {
+        'id': s, 'object': 'subscription', 'status': 'active', 'cancel_at_period_end': False,
+        'current_period_start': now, 'current_period_end': now + 30 * 86400
+    }) for s in subscriptions]
+    if not templates:
+        templates = [('customer.created', {'id': f"cus_{uuid.uuid4().hex[:14]}", 'object': 'customer'})]
+
+    events = []
+    for n in range(count):
+        event_type, obj = templates[n % len(templates)]
+        events.append({
+            'id': f"evt_{uuid.uuid4().hex[:24]}",
+            'object': 'event',
+            'type': event_type,
+            'created': now,
+            'data': {'object': obj}
+        })
+    return events
+
+def post(url, secret, event):
+    payload = json.dumps(event).encode()
+    request = urllib.request.Request(url, data=payload, method='POST', headers={
+        'Content-Type': 'application/json',
+        'Stripe-Signature': sign_payload(payload, secret)
+    })
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Send signed Stripe-style events to the webhook')
+    parser.add_argument('--url', default='http://localhost:5000/billing/webhook/stripe')
+    parser.add_argument('--secret', default=os.environ.get('STRIPE_WEBHOOK_SECRET'))
+    parser.add_argument('--invoice', action='append', default=[], help='Stripe invoice id (repeatable)')
+    parser.add_argument('--subscription', action='append', default=[], help='Stripe subscription id (repeatable)')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--duplicates', type=int, default=0, help='Re-send this many events')
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error('Set STRIPE_WEBHOOK_SECRET or pass --secret')
+
+    events = build_events(args.invoice, args.subscription, args.count)
+    events += events[:args.duplicates]
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda event: post(args.url, args.secret, event), events))
+
+    timings = sorted(ms for _, ms in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    print(f"Sent {len(events)} events: {statuses}")
+    print(f"p50={pick(0.5):.1f}ms  p95={pick(0.95):.1f}ms  p99={pick(0.99):.1f}ms  max={timings[-1]:.1f}ms")
+
+if __name__ == '__main__':
+    main()